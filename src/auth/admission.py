@@ -0,0 +1,127 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from src.config.settings import Settings, settings
+
+RATE_LIMIT_MAX_KEYS = 100_000
+
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        """Take a token from a bucket, returning how long to wait when it is empty."""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Token buckets for a single process, forgetting the least recently used keys."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+        else:
+            retry_after = (1 - tokens) / refill_per_second
+
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return retry_after
+
+
+def create_rate_limit_backend(backend: str) -> RateLimitBackend:
+    if backend == "memory":
+        return InMemoryRateLimitBackend()
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+class AdmissionController:
+    """
+    Decides whether an expensive authentication request may run. Each
+    client address and each account has a token bucket, and the worker runs
+    a bounded number of such requests at once. Anything over a limit is
+    rejected with a 429 right away rather than queued.
+    """
+
+    def __init__(self, settings: Settings, backend: RateLimitBackend):
+        self.backend = backend
+        self.ip_burst = settings.app_auth_ip_burst
+        self.ip_refill = settings.app_auth_ip_requests_per_minute / 60
+        self.account_burst = settings.app_auth_account_burst
+        self.account_refill = settings.app_auth_account_requests_per_minute / 60
+        self.max_concurrency = settings.app_auth_max_concurrency
+        self.client_ip_header = settings.app_auth_client_ip_header
+        self.in_flight = 0
+        self.rejected: Dict[str, int] = {"ip": 0, "account": 0, "concurrency": 0}
+
+    def _reject(self, reason: str, retry_after: float):
+        self.rejected[reason] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def client_ip(self, request: Request) -> str:
+        """
+        Address the per-IP bucket is keyed on. Behind a reverse proxy every
+        request comes from the proxy's address, so either run uvicorn with
+        --proxy-headers and --forwarded-allow-ips set to the proxy, or set
+        APP_AUTH_CLIENT_IP_HEADER to a header the proxy fills in itself.
+        """
+
+        if self.client_ip_header:
+            forwarded = request.headers.get(self.client_ip_header)
+            if forwarded:
+                # A proxy appends the address it saw, after any the client sent.
+                return forwarded.split(",")[-1].strip()
+        return request.client.host if request.client else "unknown"
+
+    def check_account(self, account: str):
+        retry_after = self.backend.take(
+            f"account:{account.lower()}", self.account_burst, self.account_refill
+        )
+        if retry_after:
+            self._reject("account", retry_after)
+
+    @asynccontextmanager
+    async def admit(self, client_ip: str):
+        retry_after = self.backend.take(
+            f"ip:{client_ip}", self.ip_burst, self.ip_refill
+        )
+        if retry_after:
+            self._reject("ip", retry_after)
+        if self.in_flight >= self.max_concurrency:
+            self._reject("concurrency", 1)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rejected": dict(self.rejected),
+        }
+
+
+admission_controller = AdmissionController(
+    settings, create_rate_limit_backend(settings.app_auth_rate_limit_backend)
+)
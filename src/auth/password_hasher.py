@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from src.constants import PASSWORD_HASH_QUEUE_LIMIT, PASSWORD_HASH_WORKERS
+from src.utils import hash_password, verify_and_update_password
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small thread pool so hashing never blocks the event
+    loop. bcrypt releases the GIL, so the threads hash in parallel. Work
+    beyond the queue limit is turned away with a 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+        self.pending = 0
+        self.max_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The server is busy, please try again",
+            )
+
+        def run():
+            return time.monotonic(), func(*args)
+
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        queued_at = time.monotonic()
+        try:
+            started_at, result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, run
+            )
+        finally:
+            self.pending -= 1
+
+        finished_at = time.monotonic()
+        self.completed += 1
+        self.total_wait_seconds += started_at - queued_at
+        self.total_run_seconds += finished_at - started_at
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify a password, returning a new hash when the stored one is outdated."""
+
+        return await self._run(verify_and_update_password, password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "running": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "max_queued": max(self.max_pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": (
+                self.total_wait_seconds / self.completed if self.completed else 0.0
+            ),
+            "avg_run_seconds": (
+                self.total_run_seconds / self.completed if self.completed else 0.0
+            ),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
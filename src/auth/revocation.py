@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from src.documents.blacklist_token import BlackListToken
+from src.manager.message_bus import InMemoryMessageBus, MessageBus
+
+TOKEN_REVOCATION_TOPIC = "token_revocation"
+REVOCATION_SYNC_SECONDS = 5
+REVOCATION_PRUNE_SECONDS = 300
+BLOOM_FILTER_CAPACITY = 100_000
+BLOOM_FILTER_ERROR_RATE = 0.001
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false positive rate."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @staticmethod
+    def _seeds(token_hash: str) -> Tuple[int, int]:
+        # The key is already a uniform digest, so two halves of it seed double hashing.
+        return int(token_hash[:16], 16), int(token_hash[16:32], 16) | 1
+
+    def add(self, token_hash: str):
+        first, second = self._seeds(token_hash)
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, token_hash: str) -> bool:
+        first, second = self._seeds(token_hash)
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.size
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class TokenRevocationList:
+    """
+    In-memory view of the revoked tokens that have not expired yet.
+
+    Lookups go through a Bloom filter first, so tokens that were never
+    revoked are rejected without touching the exact set. Revocations are
+    stored in `blacklist_tokens`, announced to the other workers over the
+    message bus and picked up incrementally from the collection as well, in
+    case a bus message was missed.
+    """
+
+    def __init__(self, bus: Optional[MessageBus] = None):
+        self.revoked: Dict[str, float] = {}
+        self.bloom = BloomFilter(BLOOM_FILTER_CAPACITY, BLOOM_FILTER_ERROR_RATE)
+        self.last_synced_id = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self.attach_bus(bus or InMemoryMessageBus())
+
+    def attach_bus(self, bus: MessageBus):
+        self.bus = bus
+        bus.subscribe(TOKEN_REVOCATION_TOPIC, self._handle_bus_message)
+
+    def is_revoked(self, token: str) -> bool:
+        if not self.revoked:
+            return False
+        token_hash = hash_token(token)
+        if token_hash not in self.bloom:
+            return False
+        expires_at = self.revoked.get(token_hash)
+        return expires_at is not None and expires_at > time.time()
+
+    async def revoke(self, token: str, expires_at: datetime):
+        token_hash = hash_token(token)
+        await BlackListToken(token_hash=token_hash, expires_at=expires_at).insert()
+        self._add(token_hash, expires_at.timestamp())
+        await self.bus.publish(
+            TOKEN_REVOCATION_TOPIC,
+            {"token_hash": token_hash, "expires_at": expires_at.timestamp()},
+        )
+
+    def _add(self, token_hash: str, expires_at: float):
+        if token_hash in self.revoked:
+            return
+        self.revoked[token_hash] = expires_at
+        if len(self.revoked) > self.bloom.capacity:
+            self._prune()
+        else:
+            self.bloom.add(token_hash)
+
+    def _prune(self):
+        """Forget expired tokens and rebuild the filter, growing it when full."""
+
+        now = time.time()
+        self.revoked = {
+            token_hash: expires_at
+            for token_hash, expires_at in self.revoked.items()
+            if expires_at > now
+        }
+        capacity = BLOOM_FILTER_CAPACITY
+        while capacity < len(self.revoked) * 2:
+            capacity *= 2
+        self.bloom = BloomFilter(capacity, BLOOM_FILTER_ERROR_RATE)
+        for token_hash in self.revoked:
+            self.bloom.add(token_hash)
+
+    async def _handle_bus_message(self, message: dict):
+        self._add(message["token_hash"], message["expires_at"])
+
+    async def sync(self):
+        """Load revocations stored since the last sync."""
+
+        query = {"expires_at": {"$gt": datetime.now(timezone.utc)}}
+        if self.last_synced_id:
+            query["_id"] = {"$gt": self.last_synced_id}
+
+        cursor = (
+            BlackListToken.get_motor_collection()
+            .find(query, {"token_hash": 1, "expires_at": 1})
+            .sort("_id", 1)
+        )
+        async for document in cursor:
+            self.last_synced_id = document["_id"]
+            expires_at = document["expires_at"].replace(tzinfo=timezone.utc)
+            self._add(document["token_hash"], expires_at.timestamp())
+
+    async def _sync_loop(self):
+        pruned_at = time.monotonic()
+        while True:
+            await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+            try:
+                await self.sync()
+                if time.monotonic() - pruned_at >= REVOCATION_PRUNE_SECONDS:
+                    self._prune()
+                    pruned_at = time.monotonic()
+            except Exception as e:
+                print(f"Error: failed to sync revoked tokens: {e}")
+
+    async def start(self):
+        await self.sync()
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+
+token_revocation_list = TokenRevocationList()
@@ -2,7 +2,12 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
 from jose import jwt, JWTError
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import time
+from uuid import uuid4
+from src.auth.revocation import token_revocation_list
+from src.cache.ttl_cache import TTLCache
+from src.constants import TOKEN_CACHE_MAX_ENTRIES
 from src.schemas.token import TokenData
 from src.config.settings import settings
 
@@ -15,6 +20,9 @@ class TokenManager:
         self.algorithm = settings.jwt_algorithm
         self.access_token_expire_minutes = settings.jwt_access_token_expire_minutes
         self.refresh_token_expire_days = settings.jwt_refresh_token_expire_days
+        self.verified_tokens: TTLCache[str] = TTLCache(
+            TOKEN_CACHE_MAX_ENTRIES, self.access_token_expire_minutes * 60
+        )
 
     def _create_token(self, data: dict, expires_delta: timedelta) -> str:
         to_encode = data.copy()
@@ -25,6 +33,13 @@ class TokenManager:
 
     def _decode_token(self, token: str) -> Optional[str]:
         """Verify and decode the refresh token, returning the user_id if valid."""
+        if token_revocation_list.is_revoked(token):
+            return None
+
+        user_id = self.verified_tokens.get(token)
+        if user_id:
+            return user_id
+
         try:
             payload = jwt.decode(
                 token,
@@ -35,18 +50,42 @@ class TokenManager:
             user_id = payload.get("user_id")
             if user_id is None:
                 return None
+            # Claims stay valid until the token expires, so skip re-verifying it.
+            expires_in = payload.get("exp", 0) - time.time()
+            if expires_in > 0:
+                self.verified_tokens.set(token, user_id, ttl_seconds=expires_in)
             return user_id
         except JWTError as e:
             print(f"JWT error: {e}")
             return None
 
+    @staticmethod
+    def get_expiry(token: str) -> datetime:
+        """Read the expiry of a token that has already been verified."""
+        expires_at = jwt.get_unverified_claims(token)["exp"]
+        return datetime.fromtimestamp(expires_at, tz=timezone.utc)
+
+    @staticmethod
+    def get_user_id(token: str) -> Optional[str]:
+        """Read the user_id of a token that has already been verified."""
+        return jwt.get_unverified_claims(token).get("user_id")
+
+    def forget_token(self, token: str):
+        """Drop a revoked token from the verified token cache."""
+        self.verified_tokens.invalidate([token])
+
     def create_access_token(self, data: dict) -> str:
         expires_delta = timedelta(minutes=self.access_token_expire_minutes)
         return self._create_token(data, expires_delta)
 
     def create_refresh_token(self, data: dict) -> str:
         expires_delta = timedelta(days=self.refresh_token_expire_days)
-        return self._create_token(data, expires_delta)
+        # Rotated tokens must differ even when issued within the same second.
+        return self._create_token({**data, "jti": uuid4().hex}, expires_delta)
+
+    def verify_refresh_token(self, token: str) -> Optional[str]:
+        """Return the user_id of a valid refresh token that has not been revoked."""
+        return self._decode_token(token)
 
     def get_current_user(self, token: str = Depends(oauth2_scheme)) -> TokenData:
         """Extract and verify the user ID from the access token."""
@@ -69,3 +108,6 @@ class TokenManager:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         return TokenData(user_id=user_id)
+
+
+token_manager = TokenManager()
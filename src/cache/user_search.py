@@ -0,0 +1,9 @@
+from typing import List
+from src.cache.ttl_cache import TTLCache
+from src.constants import USER_SEARCH_CACHE_MAX_ENTRIES, USER_SEARCH_CACHE_TTL_SECONDS
+from src.schemas.user import UserSummary
+
+# Search candidates by search key, shared by every user of this worker.
+user_search_cache: TTLCache[List[UserSummary]] = TTLCache(
+    USER_SEARCH_CACHE_MAX_ENTRIES, USER_SEARCH_CACHE_TTL_SECONDS
+)
@@ -3,10 +3,33 @@ from beanie import init_beanie
 from fastapi import FastAPI
 from src.documents.blacklist_token import BlackListToken
 from src.documents.study_room import StudyRoom
+from src.documents.study_room_content import StudyRoomContentChunk
 from src.documents.user_document import UserDocument
 from src.documents.friend_request import FriendRequest
+from src.documents.friendship import Friendship
 from src.documents.invitation import Invitation
+from src.auth.password_hasher import password_hasher
+from src.auth.revocation import token_revocation_list
+from src.config.indexes import verify_indexes
 from src.config.settings import settings
+from src.manager.connection_manager import connection_manager
+from src.manager.friend_graph import friend_graph
+from src.manager.message_bus import create_message_bus
+from src.manager.presence import presence_manager
+from src.manager.study_room_manager import study_room_manager
+from src.repositories.friend_request_repository import FriendRequestRepository
+from src.repositories.friendship_repository import FriendshipRepository
+from src.repositories.user_repository import UserRepository
+
+DOCUMENT_MODELS = [
+    UserDocument,
+    BlackListToken,
+    FriendRequest,
+    Friendship,
+    StudyRoom,
+    StudyRoomContentChunk,
+    Invitation,
+]
 
 
 async def db_lifespan(app: FastAPI):
@@ -15,13 +38,8 @@ async def db_lifespan(app: FastAPI):
 
     await init_beanie(
         database=app.database,
-        document_models=[
-            UserDocument,
-            BlackListToken,
-            FriendRequest,
-            StudyRoom,
-            Invitation,
-        ],
+        document_models=DOCUMENT_MODELS,
+        skip_indexes=not settings.create_indexes,
     )
 
     ping_response = await app.database.command("ping")
@@ -30,6 +48,32 @@ async def db_lifespan(app: FastAPI):
             "Unable to connect to the MongoDB cluster. Please check your database connection settings."
         )
 
+    if not settings.create_indexes:
+        await verify_indexes(DOCUMENT_MODELS)
+
+    # Friend lists must move out before anything rewrites whole user documents.
+    await FriendshipRepository.backfill_from_user_arrays()
+    await UserRepository.backfill_search_keys()
+    await FriendRequestRepository.backfill_pair_keys()
+
+    message_bus = create_message_bus(settings.app_message_bus, app.database)
+    study_room_manager.attach_bus(message_bus)
+    connection_manager.attach_bus(message_bus)
+    token_revocation_list.attach_bus(message_bus)
+    friend_graph.attach_bus(message_bus)
+    presence_manager.attach_bus(message_bus)
+    await message_bus.start()
+    await token_revocation_list.start()
+    await friend_graph.load()
+    await presence_manager.start()
+    await study_room_manager.start()
+
     yield
 
+    await study_room_manager.stop()
+    await study_room_manager.flush_all()
+    await presence_manager.stop()
+    await token_revocation_list.stop()
+    await message_bus.stop()
+    password_hasher.shutdown()
     app.mongodb_client.close()
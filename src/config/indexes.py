@@ -0,0 +1,48 @@
+from typing import Dict, List, Tuple, Type
+
+from beanie import Document
+
+IndexKey = Tuple[Tuple[str, object], ...]
+
+
+def declared_indexes(document_model: Type[Document]) -> Dict[IndexKey, dict]:
+    """Map the key of every index a document model declares to its options."""
+
+    indexes = {}
+    for index in getattr(document_model.Settings, "indexes", []):
+        spec = dict(index.document)
+        key = tuple(spec.pop("key").items())
+        spec.pop("name", None)
+        indexes[key] = spec
+    return indexes
+
+
+async def find_missing_indexes(document_models: List[Type[Document]]) -> List[str]:
+    """List the declared indexes that are absent or differ in uniqueness."""
+
+    missing = []
+    for document_model in document_models:
+        collection = document_model.get_motor_collection()
+        existing = {
+            tuple(info["key"]): info.get("unique", False)
+            for info in (await collection.index_information()).values()
+        }
+        for key, options in declared_indexes(document_model).items():
+            if existing.get(key) != options.get("unique", False):
+                fields = ", ".join(f"{field} {order}" for field, order in key)
+                missing.append(f"{collection.name} ({fields})")
+    return missing
+
+
+async def verify_indexes(document_models: List[Type[Document]]):
+    """
+    Refuse to start against a database lacking the declared indexes, instead
+    of silently serving every listing with a collection scan.
+    """
+
+    missing = await find_missing_indexes(document_models)
+    if missing:
+        raise RuntimeError(
+            "Missing MongoDB indexes, create them before deploying: "
+            + "; ".join(missing)
+        )
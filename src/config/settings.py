@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -10,6 +11,15 @@ class Settings(BaseSettings):
     app_frontend_url: str
     app_localhost_url: str
     app_environment: str
+    app_message_bus: str = "memory"
+    app_create_indexes: Optional[bool] = None
+    app_auth_rate_limit_backend: str = "memory"
+    app_auth_ip_requests_per_minute: float = 20
+    app_auth_ip_burst: int = 10
+    app_auth_account_requests_per_minute: float = 5
+    app_auth_account_burst: int = 5
+    app_auth_max_concurrency: int = 8
+    app_auth_client_ip_header: Optional[str] = None
 
     @property
     def allowed_origins(self):
@@ -19,6 +29,12 @@ class Settings(BaseSettings):
             return [self.app_frontend_url]
         return []
 
+    @property
+    def create_indexes(self) -> bool:
+        if self.app_create_indexes is not None:
+            return self.app_create_indexes
+        return self.app_environment == "dev"
+
     class Config:
         env_file = ".env"
 
@@ -1,2 +1,19 @@
 RESPONSE_STATUS_SUCCESS = "success"
 RESPONSE_STATUS_ERROR = "error"
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+SEARCH_KEY_MAX_LENGTH = 20
+USER_SEARCH_LIMIT = 10
+USER_SEARCH_CANDIDATE_LIMIT = 50
+USER_SEARCH_CACHE_MAX_ENTRIES = 2048
+USER_SEARCH_CACHE_TTL_SECONDS = 30
+TOKEN_CACHE_MAX_ENTRIES = 10000
+FRIEND_SUGGESTION_LIMIT = 10
+
+PASSWORD_HASH_ROUNDS = 12
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_QUEUE_LIMIT = 64
+
+DUPLICATE_KEY_ERROR_CODE = 11000
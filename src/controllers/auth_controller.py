@@ -1,4 +1,5 @@
-from fastapi import Response
+from typing import Optional
+from fastapi import Response, status
 from src.services.auth_service import AuthService
 from src.services.user_service import UserService
 from src.schemas.user import UserCreate, UserLogin
@@ -13,7 +14,11 @@ class AuthController:
 
     async def register(self, user: UserCreate, user_service: UserService):
         await self.auth_service.register(user, user_service)
-        return create_response(RESPONSE_STATUS_SUCCESS, "User registered successfully")
+        return create_response(
+            RESPONSE_STATUS_SUCCESS,
+            "User registered successfully",
+            status_code=status.HTTP_201_CREATED,
+        )
 
     async def login(
         self,
@@ -29,11 +34,29 @@ class AuthController:
             RESPONSE_STATUS_SUCCESS,
             "Login successful",
             data={"access_token": access_token},
+            response=response,
         )
 
-    async def logout(self, token: str):
-        await self.auth_service.blacklist_token(token)
-        return create_response(RESPONSE_STATUS_SUCCESS, "Logout successful")
+    async def logout(
+        self,
+        response: Response,
+        token: str,
+        refresh_token: Optional[str],
+        token_manager: TokenManager,
+    ):
+        await self.auth_service.blacklist_token(
+            token, refresh_token, response, token_manager
+        )
+        return create_response(
+            RESPONSE_STATUS_SUCCESS, "Logout successful", response=response
+        )
 
-    async def refresh_token(self, response: Response, token_manager: TokenManager):
-        return await self.auth_service.refresh_token(response, token_manager)
+    async def refresh_token(
+        self,
+        response: Response,
+        refresh_token: Optional[str],
+        token_manager: TokenManager,
+    ):
+        return await self.auth_service.refresh_token(
+            response, refresh_token, token_manager
+        )
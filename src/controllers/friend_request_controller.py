@@ -1,6 +1,7 @@
 from typing import Optional
+from fastapi import status
 from src.services.user_service import UserService
-from src.utils import create_response
+from src.utils import create_response, create_pagination
 from src.constants import RESPONSE_STATUS_SUCCESS
 from src.services.friend_request_service import FriendRequestService
 
@@ -10,15 +11,23 @@ class FriendRequestController:
         self.friend_request_service = FriendRequestService()
 
     async def get_received_requests(
-        self, user_id: str, status: Optional[str], user_service: UserService
+        self,
+        user_id: str,
+        status: Optional[str],
+        user_service: UserService,
+        cursor: Optional[str],
+        limit: int,
     ):
-        friend_request = await self.friend_request_service.get_received_requests(
-            user_id, status, user_service
+        friend_request, next_cursor = (
+            await self.friend_request_service.get_received_requests(
+                user_id, status, user_service, cursor, limit
+            )
         )
         return create_response(
             RESPONSE_STATUS_SUCCESS,
             "Friend requests fetched successfully",
             data={"friend_requests": friend_request},
+            pagination=create_pagination(next_cursor, limit),
         )
 
     async def send_friend_request(
@@ -28,7 +37,9 @@ class FriendRequestController:
             from_user_id, to_user_id, user_service
         )
         return create_response(
-            RESPONSE_STATUS_SUCCESS, "Friend request sent successfully"
+            RESPONSE_STATUS_SUCCESS,
+            "Friend request sent successfully",
+            status_code=status.HTTP_201_CREATED,
         )
 
     async def update_request_status(
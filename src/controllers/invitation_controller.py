@@ -1,9 +1,10 @@
+from typing import Optional
+from fastapi import status
 from src.schemas.invitation import InvitationCreate
 
 from src.services.invitation_service import InvitationService
 from src.services.study_room_service import StudyRoomService
-from src.services.user_service import UserService
-from src.utils import create_response
+from src.utils import create_response, create_pagination
 from src.constants import RESPONSE_STATUS_SUCCESS
 
 
@@ -16,15 +17,19 @@ class InvitationController:
         self,
         current_user_id: str,
         study_room_service: StudyRoomService,
-        user_service: UserService,
+        cursor: Optional[str],
+        limit: int,
     ):
-        invitations = await self.invitation_service.get_received_invitations(
-            current_user_id, study_room_service, user_service
+        invitations, next_cursor = (
+            await self.invitation_service.get_received_invitations(
+                current_user_id, study_room_service, cursor, limit
+            )
         )
         return create_response(
             RESPONSE_STATUS_SUCCESS,
             "Invitation fetched successfully",
             data={"invitations": invitations},
+            pagination=create_pagination(next_cursor, limit),
         )
 
     async def create_invitation(
@@ -37,7 +42,9 @@ class InvitationController:
             current_user_id, invitation, study_room_service
         )
         return create_response(
-            RESPONSE_STATUS_SUCCESS, "Invitation created successfully"
+            RESPONSE_STATUS_SUCCESS,
+            "Invitation created successfully",
+            status_code=status.HTTP_201_CREATED,
         )
 
     async def update_invitation_status(
@@ -0,0 +1,20 @@
+from src.auth.admission import admission_controller
+from src.auth.password_hasher import password_hasher
+from src.auth.token_manager import token_manager
+from src.cache.user_search import user_search_cache
+from src.constants import RESPONSE_STATUS_SUCCESS
+from src.utils import create_response
+
+
+class MetricsController:
+    async def get_metrics(self):
+        return create_response(
+            RESPONSE_STATUS_SUCCESS,
+            "Metrics fetched successfully",
+            data={
+                "user_search_cache": user_search_cache.stats(),
+                "token_cache": token_manager.verified_tokens.stats(),
+                "password_hasher": password_hasher.stats(),
+                "auth_admission": admission_controller.stats(),
+            },
+        )
@@ -1,9 +1,12 @@
+from typing import Optional
+from fastapi.responses import StreamingResponse
+
 from src.constants import RESPONSE_STATUS_SUCCESS
 
 from src.schemas.study_room import StudyRoomCreate, StudyRoomUpdate
 from src.services.study_room_service import StudyRoomService
 
-from src.utils import create_response
+from src.utils import create_response, create_pagination
 
 
 class StudyRoomController:
@@ -22,12 +25,17 @@ class StudyRoomController:
             data={"study_room": study_room},
         )
 
-    async def list_study_rooms(self, study_room_id: str):
-        study_rooms = await self.study_room_service.list_study_rooms(study_room_id)
+    async def list_study_rooms(
+        self, current_user_id: str, cursor: Optional[str], limit: int
+    ):
+        study_rooms, next_cursor = await self.study_room_service.list_study_rooms(
+            current_user_id, cursor, limit
+        )
         return create_response(
             RESPONSE_STATUS_SUCCESS,
             "Study rooms listing fetched successfully",
             data={"study_rooms": study_rooms},
+            pagination=create_pagination(next_cursor, limit),
         )
 
     async def retrieve_study_room(self, current_user_id: str, study_room_id: str):
@@ -50,6 +58,12 @@ class StudyRoomController:
             RESPONSE_STATUS_SUCCESS, "Study room updated successfully"
         )
 
+    async def stream_study_room_content(self, current_user_id: str, study_room_id: str):
+        content = await self.study_room_service.stream_study_room_content(
+            current_user_id, study_room_id
+        )
+        return StreamingResponse(content, media_type="text/plain; charset=utf-8")
+
     async def end_study_room(self, current_user_id: str, study_room_id: str):
         await self.study_room_service.end_study_room(current_user_id, study_room_id)
         return create_response(RESPONSE_STATUS_SUCCESS, "Study Room ended successfully")
@@ -85,13 +99,19 @@ class StudyRoomController:
         )
 
     async def search_invitation_by_room(
-        self, current_user_id: str, study_room_id: str, query: str
+        self,
+        current_user_id: str,
+        study_room_id: str,
+        query: str,
+        cursor: Optional[str],
+        limit: int,
     ):
-        users = await self.study_room_service.search_invitation_by_room(
-            current_user_id, study_room_id, query
+        users, next_cursor = await self.study_room_service.search_invitation_by_room(
+            current_user_id, study_room_id, query, cursor, limit
         )
         return create_response(
             RESPONSE_STATUS_SUCCESS,
             "User's with study room invitations fetched successfully ",
             {"users": users},
+            pagination=create_pagination(next_cursor, limit),
         )
@@ -1,5 +1,7 @@
+from typing import Optional
+from fastapi import status
 from src.schemas.token import TokenData
-from src.utils import create_response, convert_to_pydantic_object_id
+from src.utils import create_response, create_pagination, convert_to_pydantic_object_id
 from src.services.user_service import UserService
 from src.constants import RESPONSE_STATUS_SUCCESS
 
@@ -9,8 +11,8 @@ class UserController:
     def __init__(self):
         self.user_service = UserService()
 
-    async def search_users(self, query: str, token: TokenData):
-        users = await self.user_service.search_users(query, token.user_id)
+    async def search_users(self, query: str, token: TokenData, limit: int):
+        users = await self.user_service.search_users(query, token.user_id, limit)
         return create_response(
             RESPONSE_STATUS_SUCCESS, "User fetched successfully", data={"users": users}
         )
@@ -23,17 +25,40 @@ class UserController:
             RESPONSE_STATUS_SUCCESS, "User fetched successfully", data={"user": user}
         )
 
-    async def get_user_friends(self, user_id: str):
-        friends = await self.user_service.get_user_friends(user_id)
+    async def get_user_friends(self, user_id: str, cursor: Optional[str], limit: int):
+        friends, next_cursor = await self.user_service.get_user_friends(
+            user_id, cursor, limit
+        )
         return create_response(
             RESPONSE_STATUS_SUCCESS,
             "Friends fetched successfully",
             data={"friends": friends},
+            pagination=create_pagination(next_cursor, limit),
+        )
+
+    async def get_friend_suggestions(self, user_id: str, limit: int):
+        suggestions = await self.user_service.get_friend_suggestions(user_id, limit)
+        return create_response(
+            RESPONSE_STATUS_SUCCESS,
+            "Friend suggestions fetched successfully",
+            data={"suggestions": suggestions},
+        )
+
+    async def get_friends_presence(self, user_id: str):
+        presence = self.user_service.get_friends_presence(user_id)
+        return create_response(
+            RESPONSE_STATUS_SUCCESS,
+            "Friends presence fetched successfully",
+            data={"presence": presence},
         )
 
     async def add_friend(self, user_id: str, friend_id: str):
         await self.user_service.add_friend(user_id, friend_id)
-        return create_response(RESPONSE_STATUS_SUCCESS, "Friend successfully added")
+        return create_response(
+            RESPONSE_STATUS_SUCCESS,
+            "Friend successfully added",
+            status_code=status.HTTP_201_CREATED,
+        )
 
     async def remove_friend(self, user_id: str, friend_id: str):
         await self.user_service.remove_friend(user_id, friend_id)
@@ -1,8 +1,14 @@
+from datetime import datetime
 from beanie import Document
+from pymongo import ASCENDING, IndexModel
 
 
 class BlackListToken(Document):
-    token: str
+    token_hash: str
+    expires_at: datetime
 
     class Settings:
         collection = "blacklist_tokens"
+        indexes = [
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
@@ -1,4 +1,5 @@
 from beanie import PydanticObjectId, Document
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from datetime import datetime
 from typing import Optional
 from enum import Enum
@@ -10,12 +11,46 @@ class FriendRequestStatus(Enum):
     REJECTED = "rejected"
 
 
+def friend_request_pair_key(
+    user_id: PydanticObjectId, other_user_id: PydanticObjectId
+) -> str:
+    """Key shared by both directions of a request between two users."""
+    return ":".join(sorted((str(user_id), str(other_user_id))))
+
+
 class FriendRequest(Document):
     sender_id: PydanticObjectId
     receiver_id: PydanticObjectId
     status: FriendRequestStatus = FriendRequestStatus.PENDING
+    pair_key: Optional[str] = None
     created_at: datetime = datetime.now()
     responded_at: Optional[datetime] = None
 
     class Settings:
         collection = "friend_requests"
+        indexes = [
+            IndexModel([("receiver_id", ASCENDING), ("_id", DESCENDING)]),
+            IndexModel(
+                [
+                    ("receiver_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("_id", DESCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("sender_id", ASCENDING),
+                    ("receiver_id", ASCENDING),
+                    ("status", ASCENDING),
+                ]
+            ),
+            # At most one pending request between two users, in either direction.
+            IndexModel(
+                [("pair_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={
+                    "status": FriendRequestStatus.PENDING.value,
+                    "pair_key": {"$exists": True},
+                },
+            ),
+        ]
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+
+class Friendship(Document):
+    """One direction of a friendship. Every friendship is stored as two edges."""
+
+    user_id: PydanticObjectId
+    friend_id: PydanticObjectId
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        collection = "friendships"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("friend_id", DESCENDING)], unique=True
+            ),
+        ]
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
 from beanie import Document, PydanticObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from src.schemas.invitation import InvitationStatus
 
 
@@ -14,3 +15,19 @@ class Invitation(Document):
 
     class Settings:
         collection = "invitations"
+        indexes = [
+            IndexModel(
+                [
+                    ("invited_user_id", ASCENDING),
+                    ("status", ASCENDING),
+                    ("_id", DESCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("study_room_id", ASCENDING),
+                    ("invited_user_id", ASCENDING),
+                    ("status", ASCENDING),
+                ]
+            ),
+        ]
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 from beanie import Document
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 from src.schemas.participant import Participant
 
@@ -9,10 +10,14 @@ class StudyRoom(Document):
     name: str
     description: str
     participants: List[Participant] = []
-    content: str = ""
     is_active: bool = True
     created_at: datetime = datetime.now()
     ended_at: Optional[datetime] = None
 
     class Settings:
         collection = "study_rooms"
+        use_state_management = True
+        indexes = [
+            IndexModel([("participants.user_id", ASCENDING), ("_id", DESCENDING)]),
+            IndexModel([("participants.user_id", ASCENDING), ("is_active", ASCENDING)]),
+        ]
@@ -0,0 +1,16 @@
+from beanie import Document, PydanticObjectId
+from pymongo import ASCENDING, IndexModel
+
+
+class StudyRoomContentChunk(Document):
+    study_room_id: PydanticObjectId
+    index: int
+    data: str
+
+    class Settings:
+        collection = "study_room_content_chunks"
+        indexes = [
+            IndexModel(
+                [("study_room_id", ASCENDING), ("index", ASCENDING)], unique=True
+            ),
+        ]
@@ -1,17 +1,49 @@
-from typing import List, Optional, Annotated
-from beanie import PydanticObjectId, Indexed
-from pydantic import EmailStr
+from typing import List
+from beanie import (
+    Insert,
+    Replace,
+    Save,
+    SaveChanges,
+    after_event,
+    before_event,
+)
+from pydantic import EmailStr, PrivateAttr
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from src.cache.user_search import user_search_cache
+from src.utils import build_search_keys
 from .base_document import BaseDocument
 
 
 class UserDocument(BaseDocument):
-    email: EmailStr = Annotated[EmailStr, Indexed(unique=True, text=True)]
+    email: EmailStr
     first_name: str
     last_name: str
     password: str
-    friends: Optional[List[PydanticObjectId]] = None
-    friend_requests_sent: Optional[List[PydanticObjectId]] = None
-    friend_requests_received: Optional[List[PydanticObjectId]] = None
+    search_keys: List[str] = []
+    _stale_search_keys: List[str] = PrivateAttr(default_factory=list)
+
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def update_search_keys(self):
+        search_keys = build_search_keys(
+            self.email,
+            self.first_name,
+            self.last_name,
+            f"{self.first_name} {self.last_name}",
+        )
+        if search_keys != self.search_keys:
+            self._stale_search_keys = [*self.search_keys, *search_keys]
+            self.search_keys = search_keys
+
+    @after_event(Insert, Replace, Save, SaveChanges)
+    def invalidate_search_cache(self):
+        if self._stale_search_keys:
+            user_search_cache.invalidate(self._stale_search_keys)
+            self._stale_search_keys = []
 
     class Settings:
         collection = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)], unique=True),
+            IndexModel([("search_keys", ASCENDING), ("email", ASCENDING)]),
+            IndexModel([("search_keys", ASCENDING), ("_id", DESCENDING)]),
+        ]
@@ -11,12 +11,17 @@ from src.routers import (
     study_room,
     invitation,
     websocket,
+    metrics,
 )
 
-from src.utils import http_exception_handler, validation_exception_handler
+from src.utils import (
+    EnvelopeResponse,
+    http_exception_handler,
+    validation_exception_handler,
+)
 
 
-app = FastAPI(lifespan=db_lifespan)
+app = FastAPI(lifespan=db_lifespan, default_response_class=EnvelopeResponse)
 
 origins = [
     settings.allowed_origins,
@@ -41,6 +46,7 @@ api_router.include_router(friend_requests.router)
 api_router.include_router(study_room.router)
 api_router.include_router(invitation.router)
 api_router.include_router(websocket.router)
+api_router.include_router(metrics.router)
 
 app.include_router(api_router)
 
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Any, Optional
+
+from fastapi import WebSocket
+from pydantic_core import from_json, to_json
+
+CONNECTION_QUEUE_SIZE = 256
+CONNECTION_SEND_TIMEOUT_SECONDS = 10
+CONNECTION_CLOSE_TIMEOUT_SECONDS = 2
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def encode_message(message: dict) -> str:
+    return to_json(message).decode()
+
+
+def decode_message(text: str) -> Any:
+    return from_json(text)
+
+
+class Connection:
+    """
+    A websocket with its own bounded outbound queue drained by a writer task.
+
+    Slow consumer policy: frames are never dropped or coalesced, since clients
+    apply document operations in order. A connection whose queue fills up, or
+    whose socket does not accept a frame within the send timeout, is closed so
+    the client reconnects and resyncs.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CONNECTION_QUEUE_SIZE)
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def _close_in_background(self, code: int):
+        """Close from synchronous code, keeping the task referenced until it ends."""
+
+        if self._close_task is None:
+            self._close_task = asyncio.create_task(self.close(code))
+            self._close_task.add_done_callback(self._report_close_failure)
+
+    @staticmethod
+    def _report_close_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            print(f"Error: failed to close connection: {task.exception()}")
+
+    def enqueue(self, text: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self._close_in_background(SLOW_CONSUMER_CLOSE_CODE)
+            return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_text(text), CONNECTION_SEND_TIMEOUT_SECONDS
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Closing slow or broken connection: {e}")
+            self._close_in_background(SLOW_CONSUMER_CLOSE_CODE)
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=code), CONNECTION_CLOSE_TIMEOUT_SECONDS
+            )
+        except Exception:
+            pass
@@ -0,0 +1,68 @@
+from typing import Dict, Iterable, Optional
+from uuid import uuid4
+
+from fastapi import WebSocket
+
+from src.manager.connection import Connection, encode_message
+from src.manager.message_bus import InMemoryMessageBus, MessageBus
+
+USER_EVENTS_TOPIC = "user_events"
+
+
+class ConnectionManager:
+    """
+    Notification websocket hub. A user may hold several connections, on this
+    node and on others, so every event is queued on all local connections
+    of its recipients and published for the other nodes to do the same.
+    """
+
+    def __init__(self, bus: Optional[MessageBus] = None):
+        self.active_connections: Dict[str, Dict[str, Connection]] = {}
+        self.attach_bus(bus or InMemoryMessageBus())
+
+    def attach_bus(self, bus: MessageBus):
+        self.bus = bus
+        bus.subscribe(USER_EVENTS_TOPIC, self._handle_bus_message)
+
+    async def connect(self, user_id: str, websocket: WebSocket) -> str:
+        await websocket.accept()
+        connection = Connection(websocket)
+        connection.start()
+        connection_id = uuid4().hex
+        self.active_connections.setdefault(user_id, {})[connection_id] = connection
+        return connection_id
+
+    async def disconnect(self, user_id: str, connection_id: str):
+        user_connections = self.active_connections.get(user_id, {})
+        connection = user_connections.pop(connection_id, None)
+        if not user_connections:
+            self.active_connections.pop(user_id, None)
+        if connection:
+            await connection.close()
+
+    async def send_event(self, user_id: str, event: dict):
+        await self.send_event_to_users([user_id], event)
+
+    async def send_event_to_users(self, user_ids: Iterable[str], event: dict):
+        """Send one event to several users, encoding it once and publishing it once."""
+
+        user_ids = list(user_ids)
+        self._send_local(user_ids, event)
+        await self.bus.publish(
+            USER_EVENTS_TOPIC, {"type": "events", "user_ids": user_ids, "event": event}
+        )
+
+    def _send_local(self, user_ids: Iterable[str], event: dict):
+        text = None
+        for user_id in user_ids:
+            for connection in self.active_connections.get(user_id, {}).values():
+                if text is None:
+                    text = encode_message(event)
+                connection.enqueue(text)
+
+    async def _handle_bus_message(self, message: dict):
+        if message["type"] == "events":
+            self._send_local(message["user_ids"], message["event"])
+
+
+connection_manager = ConnectionManager()
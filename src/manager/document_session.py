@@ -0,0 +1,45 @@
+from collections import deque
+from itertools import islice
+
+from src.manager.text_operation import TextOperation
+
+DOCUMENT_HISTORY_LIMIT = 500
+
+
+class StaleRevisionError(ValueError):
+    pass
+
+
+class DocumentSession:
+    """Server-held copy of a study room document and its recent operations."""
+
+    def __init__(self, content: str, revision: int = 0):
+        self.content = content
+        self.revision = revision
+        self.history: deque = deque(maxlen=DOCUMENT_HISTORY_LIMIT)
+
+    def receive_operation(
+        self, revision: int, operation: TextOperation
+    ) -> TextOperation:
+        """
+        Apply an operation the client based on `revision`, transforming it
+        against everything applied since, and return the operation as applied.
+        """
+
+        behind = self.revision - revision
+        if behind < 0 or behind > len(self.history):
+            raise StaleRevisionError(
+                f"Revision {revision} is not available, current is {self.revision}"
+            )
+
+        for concurrent in islice(self.history, len(self.history) - behind, None):
+            operation, _ = TextOperation.transform(operation, concurrent)
+
+        self.content = operation.apply(self.content)
+        self.history.append(operation)
+        self.revision += 1
+        return operation
+
+    def replace_content(self, content: str) -> TextOperation:
+        operation = TextOperation.replace(self.content, content)
+        return self.receive_operation(self.revision, operation)
@@ -0,0 +1,162 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from heapq import nlargest
+from itertools import chain, islice
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+
+from src.documents.friendship import Friendship
+from src.manager.message_bus import InMemoryMessageBus, MessageBus
+
+FRIEND_GRAPH_TOPIC = "friend_graph"
+# Bound on the friend-of-friend edges walked for one suggestion query.
+FRIEND_SUGGESTION_MAX_EDGES = 10_000
+
+
+class FriendGraph:
+    """
+    In-memory adjacency index of the friendship graph.
+
+    User ids are interned to small integers and every user's friends are
+    kept as a sorted array of those integers, about four bytes per edge.
+    The index is loaded from the friendships collection at startup and kept
+    current by the services that add or remove friendships, with changes
+    from other workers arriving over the message bus.
+    """
+
+    def __init__(self, bus: Optional[MessageBus] = None):
+        self.ids: Dict[PydanticObjectId, int] = {}
+        self.user_ids: List[PydanticObjectId] = []
+        self.adjacency: Dict[int, array] = {}
+        self._pending: Optional[List[dict]] = None
+        self.attach_bus(bus or InMemoryMessageBus())
+
+    def attach_bus(self, bus: MessageBus):
+        self.bus = bus
+        bus.subscribe(FRIEND_GRAPH_TOPIC, self._handle_bus_message)
+
+    def _intern(self, user_id: PydanticObjectId) -> int:
+        index = self.ids.get(user_id)
+        if index is None:
+            index = self.ids[user_id] = len(self.user_ids)
+            self.user_ids.append(PydanticObjectId(user_id))
+        return index
+
+    def _friends(self, user_id: PydanticObjectId) -> array:
+        index = self.ids.get(user_id)
+        if index is None:
+            return array("I")
+        return self.adjacency.get(index, array("I"))
+
+    async def load(self):
+        """Build the index from the stored edges."""
+
+        self._pending = []
+        adjacency: Dict[int, array] = {}
+        cursor = (
+            Friendship.get_motor_collection()
+            .find({}, {"_id": 0, "user_id": 1, "friend_id": 1})
+            .sort([("user_id", 1), ("friend_id", 1)])
+        )
+        async for edge in cursor:
+            user = self._intern(edge["user_id"])
+            friend = self._intern(edge["friend_id"])
+            adjacency.setdefault(user, array("I")).append(friend)
+
+        # Edges arrive sorted by ObjectId, not by interned index.
+        self.adjacency = {
+            user: array("I", sorted(friends)) for user, friends in adjacency.items()
+        }
+        pending, self._pending = self._pending, None
+        for message in pending:
+            self._apply(message)
+
+    def _add_edge(self, user: int, friend: int):
+        friends = self.adjacency.setdefault(user, array("I"))
+        position = bisect_left(friends, friend)
+        if position == len(friends) or friends[position] != friend:
+            insort(friends, friend)
+
+    def _remove_edge(self, user: int, friend: int):
+        friends = self.adjacency.get(user)
+        if not friends:
+            return
+        position = bisect_left(friends, friend)
+        if position < len(friends) and friends[position] == friend:
+            del friends[position]
+
+    def _apply(self, message: dict):
+        user = self._intern(PydanticObjectId(message["user_id"]))
+        friend = self._intern(PydanticObjectId(message["friend_id"]))
+        if message["type"] == "add":
+            self._add_edge(user, friend)
+            self._add_edge(friend, user)
+        elif message["type"] == "remove":
+            self._remove_edge(user, friend)
+            self._remove_edge(friend, user)
+
+    async def _handle_bus_message(self, message: dict):
+        if self._pending is not None:
+            self._pending.append(message)
+        self._apply(message)
+
+    async def _publish(self, change: str, user_id, friend_id):
+        message = {"type": change, "user_id": str(user_id), "friend_id": str(friend_id)}
+        if self._pending is not None:
+            self._pending.append(message)
+        self._apply(message)
+        await self.bus.publish(FRIEND_GRAPH_TOPIC, message)
+
+    async def add_friendship(
+        self, user_id: PydanticObjectId, friend_id: PydanticObjectId
+    ):
+        await self._publish("add", user_id, friend_id)
+
+    async def remove_friendship(
+        self, user_id: PydanticObjectId, friend_id: PydanticObjectId
+    ):
+        await self._publish("remove", user_id, friend_id)
+
+    def friend_ids(self, user_id: PydanticObjectId) -> List[PydanticObjectId]:
+        return [self.user_ids[friend] for friend in self._friends(user_id)]
+
+    def mutual_friend_counts(
+        self, user_id: PydanticObjectId, other_ids: List[PydanticObjectId]
+    ) -> Dict[PydanticObjectId, int]:
+        friends = set(self._friends(user_id))
+        return {
+            other_id: len(friends.intersection(self._friends(other_id)))
+            for other_id in other_ids
+        }
+
+    def suggest_friends(
+        self, user_id: PydanticObjectId, limit: int
+    ) -> List[Tuple[PydanticObjectId, int]]:
+        """
+        Friends of friends who are not friends yet, with their mutual friend
+        count, best first. Very large neighbourhoods are sampled up to
+        the edge budget.
+        """
+
+        index = self.ids.get(user_id)
+        if index is None:
+            return []
+
+        friends = self._friends(user_id)
+        second_hop = chain.from_iterable(self.adjacency.get(f, ()) for f in friends)
+        counts = Counter(islice(second_hop, FRIEND_SUGGESTION_MAX_EDGES))
+
+        excluded = set(friends)
+        excluded.add(index)
+        ranked = nlargest(
+            limit,
+            (item for item in counts.items() if item[0] not in excluded),
+            key=itemgetter(1),
+        )
+        return [(self.user_ids[user], count) for user, count in ranked]
+
+
+friend_graph = FriendGraph()
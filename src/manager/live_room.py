@@ -0,0 +1,58 @@
+import asyncio
+from typing import Dict, Iterator, Optional
+
+from src.documents.study_room import StudyRoom
+from src.manager.document_session import DocumentSession
+from src.schemas.participant import Participant, Permission
+from src.utils import convert_to_str
+
+
+class LiveRoom:
+    """In-memory state of a study room that has connected members."""
+
+    def __init__(self, study_room: StudyRoom, content: str):
+        self.study_room_id = convert_to_str(study_room.id)
+        self.is_active = study_room.is_active
+        self.participants: Dict[str, Participant] = {
+            convert_to_str(participant.user_id): participant
+            for participant in study_room.participants
+        }
+        self.document = DocumentSession(content)
+        # Connections, on any node, that have the room open, mapped to their node.
+        self.members: Dict[str, str] = {}
+        self.persisted_revision = self.document.revision
+        self.persisted_content: Optional[str] = content
+        self.dirty_since: Optional[float] = None
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.flush_lock = asyncio.Lock()
+
+    @property
+    def is_dirty(self) -> bool:
+        return self.document.revision != self.persisted_revision
+
+    def upsert_participant(self, participant: Participant):
+        self.participants[convert_to_str(participant.user_id)] = participant
+
+    def is_participant(self, user_id: str) -> bool:
+        participant = self.participants.get(user_id)
+        return participant is not None and participant.is_active
+
+    def is_owner(self, user_id: str) -> bool:
+        participant = self.participants.get(user_id)
+        return participant is not None and participant.is_owner
+
+    def can_edit(self, user_id: str) -> bool:
+        participant = self.participants.get(user_id)
+        return (
+            self.is_active
+            and participant is not None
+            and participant.is_active
+            and participant.permission == Permission.can_edit
+        )
+
+    def active_participant_ids(self, exclude: Optional[str] = None) -> Iterator[str]:
+        return (
+            user_id
+            for user_id, participant in self.participants.items()
+            if participant.is_active and user_id != exclude
+        )
@@ -0,0 +1,298 @@
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from uuid import uuid4
+
+from pymongo import CursorType, ReturnDocument
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+
+MessageHandler = Callable[[dict], Awaitable[None]]
+
+MESSAGE_BUS_COLLECTION = "message_bus"
+MESSAGE_BUS_LEASES_COLLECTION = "message_bus_leases"
+MESSAGE_BUS_COLLECTION_SIZE_BYTES = 64 * 1024 * 1024
+MESSAGE_BUS_RETRY_SECONDS = 1
+LEASE_TTL_SECONDS = 30
+LEASE_RENEW_SECONDS = 10
+NODE_LEASE_PREFIX = "node:"
+# Delivered only to the local node, when a lease it held was taken over.
+LEASE_LOST_TOPIC = "lease_lost"
+
+
+class MessageBus(ABC):
+    """
+    Carries messages between the websocket managers of different workers.
+
+    A message is published on a topic either to every other node or to a
+    single node. Local delivery is left to the publisher. Nodes also use the
+    bus to agree on which of them owns a key, such as a live study room.
+    """
+
+    def __init__(self):
+        self.node_id = uuid4().hex
+        self._handlers: Dict[str, MessageHandler] = {}
+
+    def subscribe(self, topic: str, handler: MessageHandler):
+        self._handlers[topic] = handler
+
+    async def _dispatch(self, topic: str, message: dict):
+        handler = self._handlers.get(topic)
+        if not handler:
+            return
+        try:
+            await handler(message)
+        except Exception as e:
+            print(f"Error: message bus handler for {topic} failed: {e}")
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, topic: str, message: dict, node_id: Optional[str] = None):
+        pass
+
+    @abstractmethod
+    async def claim(self, key: str) -> str:
+        """Take ownership of a key unless another live node holds it, returning the owner."""
+
+    @abstractmethod
+    async def release(self, key: str):
+        pass
+
+    @abstractmethod
+    async def holds(self, key: str) -> bool:
+        """Whether this node still owns the key."""
+
+    @abstractmethod
+    async def live_nodes(self) -> Set[str]:
+        """Ids of the nodes that are still running."""
+
+
+class InMemoryMessageBus(MessageBus):
+    """
+    Bus for a single process. Buses created with the same hub behave like
+    separate nodes, which lets several managers run side by side in one process.
+    """
+
+    def __init__(self, hub: Optional["InMemoryMessageBusHub"] = None):
+        super().__init__()
+        self.hub = hub or InMemoryMessageBusHub()
+        self.hub.nodes[self.node_id] = self
+
+    async def publish(self, topic: str, message: dict, node_id: Optional[str] = None):
+        for node in list(self.hub.nodes.values()):
+            if node is self or (node_id and node.node_id != node_id):
+                continue
+            await node._dispatch(topic, message)
+
+    async def claim(self, key: str) -> str:
+        owner = self.hub.leases.get(key)
+        if owner not in self.hub.nodes:
+            owner = self.hub.leases[key] = self.node_id
+        return owner
+
+    async def release(self, key: str):
+        if self.hub.leases.get(key) == self.node_id:
+            del self.hub.leases[key]
+
+    async def holds(self, key: str) -> bool:
+        return self.hub.leases.get(key) == self.node_id
+
+    async def live_nodes(self) -> Set[str]:
+        return set(self.hub.nodes)
+
+    async def stop(self):
+        self.hub.nodes.pop(self.node_id, None)
+        for key in [k for k, v in self.hub.leases.items() if v == self.node_id]:
+            del self.hub.leases[key]
+
+
+class InMemoryMessageBusHub:
+    def __init__(self):
+        self.nodes: Dict[str, InMemoryMessageBus] = {}
+        self.leases: Dict[str, str] = {}
+
+
+class MongoMessageBus(MessageBus):
+    """
+    Bus shared by every worker connected to the same MongoDB deployment.
+
+    Messages are appended to a capped collection that each node follows with
+    a tailable cursor. Ownership leases live in a regular collection and
+    expire unless the owning node keeps renewing them.
+    """
+
+    def __init__(self, database):
+        super().__init__()
+        self.database = database
+        self.messages = database[MESSAGE_BUS_COLLECTION]
+        self.leases = database[MESSAGE_BUS_LEASES_COLLECTION]
+        self.held_keys: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        try:
+            await self.database.create_collection(
+                MESSAGE_BUS_COLLECTION,
+                capped=True,
+                size=MESSAGE_BUS_COLLECTION_SIZE_BYTES,
+            )
+        except CollectionInvalid:
+            pass
+
+        # Holding a lease on its own key, renewed with the others, marks the
+        # node as alive for as long as it keeps running.
+        await self.claim(NODE_LEASE_PREFIX + self.node_id)
+
+        # A tailable cursor on an empty capped collection dies immediately.
+        result = await self.messages.insert_one(
+            {"topic": None, "origin": self.node_id, "target": self.node_id}
+        )
+        self._tasks = [
+            asyncio.create_task(self._follow(result.inserted_id)),
+            asyncio.create_task(self._renew_leases()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.held_keys:
+            await self.leases.delete_many(
+                {"_id": {"$in": list(self.held_keys)}, "node_id": self.node_id}
+            )
+            self.held_keys.clear()
+
+    async def publish(self, topic: str, message: dict, node_id: Optional[str] = None):
+        await self.messages.insert_one(
+            {
+                "topic": topic,
+                "origin": self.node_id,
+                "target": node_id,
+                "message": message,
+            }
+        )
+
+    async def _follow(self, last_id):
+        while True:
+            cursor = self.messages.find(
+                {
+                    "_id": {"$gt": last_id},
+                    "origin": {"$ne": self.node_id},
+                    "target": {"$in": [None, self.node_id]},
+                },
+                cursor_type=CursorType.TAILABLE_AWAIT,
+            )
+            try:
+                while cursor.alive:
+                    async for document in cursor:
+                        last_id = document["_id"]
+                        await self._dispatch(document["topic"], document["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error: message bus cursor failed: {e}")
+            await asyncio.sleep(MESSAGE_BUS_RETRY_SECONDS)
+
+    async def claim(self, key: str) -> str:
+        now = datetime.now(timezone.utc)
+        try:
+            await self.leases.find_one_and_update(
+                {
+                    "_id": key,
+                    "$or": [{"node_id": self.node_id}, {"expires_at": {"$lt": now}}],
+                },
+                {
+                    "$set": {
+                        "node_id": self.node_id,
+                        "expires_at": now + timedelta(seconds=LEASE_TTL_SECONDS),
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            lease = await self.leases.find_one({"_id": key})
+            if lease:
+                return lease["node_id"]
+            return await self.claim(key)
+
+        self.held_keys.add(key)
+        return self.node_id
+
+    async def release(self, key: str):
+        self.held_keys.discard(key)
+        await self.leases.delete_one({"_id": key, "node_id": self.node_id})
+
+    async def holds(self, key: str) -> bool:
+        lease = await self.leases.find_one(
+            {
+                "_id": key,
+                "node_id": self.node_id,
+                "expires_at": {"$gt": datetime.now(timezone.utc)},
+            },
+            {"_id": 1},
+        )
+        return lease is not None
+
+    async def live_nodes(self) -> Set[str]:
+        cursor = self.leases.find(
+            {
+                "_id": {"$regex": f"^{NODE_LEASE_PREFIX}"},
+                "expires_at": {"$gt": datetime.now(timezone.utc)},
+            },
+            {"node_id": 1},
+        )
+        return {lease["node_id"] async for lease in cursor}
+
+    async def _renew_leases(self):
+        while True:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+            if not self.held_keys:
+                continue
+            try:
+                keys = list(self.held_keys)
+                result = await self.leases.update_many(
+                    {"_id": {"$in": keys}, "node_id": self.node_id},
+                    {
+                        "$set": {
+                            "expires_at": datetime.now(timezone.utc)
+                            + timedelta(seconds=LEASE_TTL_SECONDS)
+                        }
+                    },
+                )
+                if result.matched_count < len(keys):
+                    # Leases that expired, during an outage for instance, may
+                    # have been claimed by another node in the meantime.
+                    renewed = set(
+                        await self.leases.distinct(
+                            "_id", {"_id": {"$in": keys}, "node_id": self.node_id}
+                        )
+                    )
+                    for key in keys:
+                        if key not in renewed:
+                            await self._lose_lease(key)
+            except Exception as e:
+                print(f"Error: failed to renew message bus leases: {e}")
+
+    async def _lose_lease(self, key: str):
+        if key not in self.held_keys:
+            return
+        self.held_keys.discard(key)
+        if key.startswith(NODE_LEASE_PREFIX):
+            # No other node claims this one, so it can simply be taken back.
+            await self.claim(key)
+        else:
+            await self._dispatch(LEASE_LOST_TOPIC, {"key": key})
+
+
+def create_message_bus(backend: str, database) -> MessageBus:
+    if backend == "memory":
+        return InMemoryMessageBus()
+    if backend == "mongo":
+        return MongoMessageBus(database)
+    raise ValueError(f"Unknown message bus backend: {backend}")
@@ -0,0 +1,331 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from bson import ObjectId
+
+from src.manager.connection_manager import ConnectionManager, connection_manager
+from src.manager.friend_graph import FriendGraph, friend_graph
+from src.manager.message_bus import InMemoryMessageBus, MessageBus
+from src.utils import convert_to_pydantic_object_id, convert_to_str
+
+PRESENCE_TOPIC = "presence"
+PRESENCE_COALESCE_SECONDS = 2
+PRESENCE_HEARTBEAT_SECONDS = 30
+PRESENCE_ENTRY_TTL_SECONDS = 90
+
+OFFLINE = "offline"
+IDLE = "idle"
+ONLINE = "online"
+IN_ROOM = "in_room"
+CLIENT_STATUSES = {ONLINE, IDLE}
+# A user connected to several nodes shows the most present of their states.
+STATUS_RANK = {OFFLINE: 0, IDLE: 1, ONLINE: 2, IN_ROOM: 3}
+
+
+@dataclass
+class PresenceEntry:
+    status: str
+    study_room_ids: Set[str]
+    expires_at: float
+
+
+@dataclass
+class LocalPresence:
+    connections: int = 0
+    client_status: str = ONLINE
+    study_room_ids: Set[str] = field(default_factory=set)
+
+    @property
+    def status(self) -> str:
+        if not self.connections:
+            return OFFLINE
+        if self.study_room_ids:
+            return IN_ROOM
+        return self.client_status
+
+
+class PresenceManager:
+    """
+    Online, idle and in-room state of every connected user.
+
+    Each node tracks the sockets it holds and shares a per-user entry with
+    the other nodes over the message bus, refreshed by a heartbeat so that
+    entries of a node that died expire. Local changes are coalesced for a
+    short window, so a reconnecting tab or a quick room switch does not
+    produce any event, and only the user's friends and the members of the
+    rooms they are in are told about the change.
+    """
+
+    def __init__(
+        self,
+        bus: Optional[MessageBus] = None,
+        connections: Optional[ConnectionManager] = None,
+        graph: Optional[FriendGraph] = None,
+    ):
+        self.connections = connections or connection_manager
+        self.graph = graph or friend_graph
+        self.local: Dict[str, LocalPresence] = {}
+        self.entries: Dict[str, Dict[str, PresenceEntry]] = {}
+        self.room_members: Dict[str, Set[str]] = {}
+        self.notified: Dict[str, str] = {}
+        self._changed: Set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.attach_bus(bus or InMemoryMessageBus())
+
+    def attach_bus(self, bus: MessageBus):
+        self.bus = bus
+        bus.subscribe(PRESENCE_TOPIC, self._handle_bus_message)
+
+    def connect(self, user_id: str):
+        self.local.setdefault(user_id, LocalPresence()).connections += 1
+        self._mark_changed(user_id)
+
+    def disconnect(self, user_id: str):
+        presence = self.local.get(user_id)
+        if not presence:
+            return
+        presence.connections = max(0, presence.connections - 1)
+        if not presence.connections:
+            presence.study_room_ids.clear()
+        self._mark_changed(user_id)
+
+    def set_status(self, user_id: str, status: str):
+        presence = self.local.get(user_id)
+        if presence and status in CLIENT_STATUSES:
+            presence.client_status = status
+            self._mark_changed(user_id)
+
+    def enter_room(self, user_id: str, study_room_id: str):
+        presence = self.local.get(user_id)
+        if presence and study_room_id not in presence.study_room_ids:
+            presence.study_room_ids.add(study_room_id)
+            self._mark_changed(user_id)
+
+    def leave_room(self, user_id: str, study_room_id: str):
+        presence = self.local.get(user_id)
+        if presence and study_room_id in presence.study_room_ids:
+            presence.study_room_ids.discard(study_room_id)
+            self._mark_changed(user_id)
+
+    def get_status(self, user_id: str) -> str:
+        now = time.time()
+        status = OFFLINE
+        for entry in self.entries.get(user_id, {}).values():
+            if entry.expires_at <= now:
+                continue
+            if STATUS_RANK[entry.status] > STATUS_RANK[status]:
+                status = entry.status
+        return status
+
+    def get_statuses(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        """Bulk lookup that leaves offline users out."""
+
+        statuses = {}
+        for user_id in user_ids:
+            status = self.get_status(user_id)
+            if status != OFFLINE:
+                statuses[user_id] = status
+        return statuses
+
+    def _mark_changed(self, user_id: str):
+        self._changed.add(user_id)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                PRESENCE_COALESCE_SECONDS, self._start_flush
+            )
+
+    def _start_flush(self):
+        self._flush_handle = None
+        task = asyncio.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """Publish the coalesced local changes and notify the interested users."""
+
+        changed, self._changed = self._changed, set()
+        updates = []
+        for user_id in changed:
+            presence = self.local.get(user_id)
+            if not presence:
+                continue
+            updates.append(self._entry_message(user_id, presence))
+            if not presence.connections:
+                del self.local[user_id]
+        if not updates:
+            return
+
+        # Rooms the users were in before the change, so that members of a
+        # room someone just left still hear about it.
+        previous_rooms = {
+            update["user_id"]: self._rooms_of(update["user_id"]) for update in updates
+        }
+        for update in updates:
+            self._apply(self.bus.node_id, update)
+        try:
+            await self.bus.publish(
+                PRESENCE_TOPIC,
+                {"type": "update", "node_id": self.bus.node_id, "entries": updates},
+            )
+        except Exception as e:
+            print(f"Error: failed to publish presence updates: {e}")
+
+        for update in updates:
+            user_id = update["user_id"]
+            await self._notify(
+                user_id, previous_rooms[user_id] | self._rooms_of(user_id)
+            )
+
+    def _rooms_of(self, user_id: str) -> Set[str]:
+        study_room_ids = set()
+        for entry in self.entries.get(user_id, {}).values():
+            study_room_ids.update(entry.study_room_ids)
+        return study_room_ids
+
+    async def _notify(self, user_id: str, study_room_ids: Set[str]):
+        status = self.get_status(user_id)
+        if self.notified.get(user_id, OFFLINE) == status:
+            return
+        if status == OFFLINE:
+            self.notified.pop(user_id, None)
+        else:
+            self.notified[user_id] = status
+        await self._send_status(user_id, status, study_room_ids)
+
+    async def _send_status(self, user_id: str, status: str, study_room_ids: Set[str]):
+        recipients = self._interested_users(user_id, study_room_ids)
+        if recipients:
+            await self.connections.send_event_to_users(
+                recipients, {"type": "status", "user_id": user_id, "status": status}
+            )
+
+    def _interested_users(self, user_id: str, study_room_ids: Set[str]) -> List[str]:
+        """Friends and room co-members of the user who are online themselves."""
+
+        recipients = set()
+        if ObjectId.is_valid(user_id):
+            recipients.update(
+                convert_to_str(friend_id)
+                for friend_id in self.graph.friend_ids(
+                    convert_to_pydantic_object_id(user_id)
+                )
+            )
+        for study_room_id in study_room_ids:
+            recipients.update(self.room_members.get(study_room_id, ()))
+        recipients.discard(user_id)
+        return [recipient for recipient in recipients if recipient in self.entries]
+
+    @staticmethod
+    def _entry_message(user_id: str, presence: LocalPresence) -> dict:
+        return {
+            "user_id": user_id,
+            "status": presence.status,
+            "study_room_ids": sorted(presence.study_room_ids),
+        }
+
+    def _apply(self, node_id: str, update: dict):
+        user_id = update["user_id"]
+        nodes = self.entries.setdefault(user_id, {})
+        previous = nodes.pop(node_id, None)
+        if previous:
+            self._index_rooms(user_id, previous.study_room_ids, add=False)
+
+        if update["status"] != OFFLINE:
+            entry = PresenceEntry(
+                update["status"],
+                set(update["study_room_ids"]),
+                time.time() + PRESENCE_ENTRY_TTL_SECONDS,
+            )
+            nodes[node_id] = entry
+            self._index_rooms(user_id, entry.study_room_ids, add=True)
+        if not nodes:
+            del self.entries[user_id]
+
+    def _index_rooms(self, user_id: str, study_room_ids: Set[str], add: bool):
+        for study_room_id in study_room_ids:
+            members = self.room_members.setdefault(study_room_id, set())
+            if add:
+                members.add(user_id)
+            else:
+                members.discard(user_id)
+                if not members:
+                    del self.room_members[study_room_id]
+
+    async def _handle_bus_message(self, message: dict):
+        if message["type"] == "update":
+            for update in message["entries"]:
+                self._apply(message["node_id"], update)
+        elif message["type"] == "sync":
+            await self._send_heartbeat(node_id=message["node_id"])
+
+    async def _send_heartbeat(self, node_id: Optional[str] = None):
+        updates = [
+            self._entry_message(user_id, presence)
+            for user_id, presence in self.local.items()
+            if presence.connections
+        ]
+        for update in updates:
+            self._apply(self.bus.node_id, update)
+        if updates:
+            await self.bus.publish(
+                PRESENCE_TOPIC,
+                {"type": "update", "node_id": self.bus.node_id, "entries": updates},
+                node_id=node_id,
+            )
+
+    async def _expire(self):
+        """
+        Drop the entries of nodes that stopped sending heartbeats, and tell
+        the interested users about the users who went offline with them.
+        """
+
+        now = time.time()
+        expired: Dict[str, Set[str]] = {}
+        for user_id in list(self.entries):
+            for node_id, entry in list(self.entries[user_id].items()):
+                if entry.expires_at <= now:
+                    expired.setdefault(user_id, set()).update(entry.study_room_ids)
+                    self._apply(node_id, {"user_id": user_id, "status": OFFLINE})
+        if not expired:
+            return
+
+        # Every node sees the same entries expire; only one of them notifies.
+        live_nodes = await self.bus.live_nodes()
+        if min(live_nodes, default=self.bus.node_id) != self.bus.node_id:
+            return
+        for user_id, study_room_ids in expired.items():
+            if self.get_status(user_id) == OFFLINE:
+                self.notified.pop(user_id, None)
+                await self._send_status(user_id, OFFLINE, study_room_ids)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(PRESENCE_HEARTBEAT_SECONDS)
+            try:
+                await self._send_heartbeat()
+                await self._expire()
+            except Exception as e:
+                print(f"Error: failed to send presence heartbeat: {e}")
+
+    async def start(self):
+        await self.bus.publish(
+            PRESENCE_TOPIC, {"type": "sync", "node_id": self.bus.node_id}
+        )
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+
+
+presence_manager = PresenceManager()
@@ -1,21 +1,653 @@
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+from uuid import uuid4
+
 from fastapi import WebSocket
 
+from src.documents.study_room import StudyRoom
+from src.manager.connection import Connection, encode_message
+from src.manager.live_room import LiveRoom
+from src.manager.message_bus import (
+    LEASE_LOST_TOPIC,
+    InMemoryMessageBus,
+    MessageBus,
+)
+from src.manager.presence import presence_manager
+from src.manager.text_operation import TextOperation
+from src.repositories.study_room_content_repository import (
+    StudyRoomContentRepository,
+)
+from src.schemas.participant import Participant
+from src.utils import convert_to_pydantic_object_id
+
+CONTENT_FLUSH_DEBOUNCE_SECONDS = 2
+CONTENT_FLUSH_MAX_INTERVAL_SECONDS = 10
+ROOM_OWNER_CACHE_SECONDS = 5
+ROOM_MEMBER_SWEEP_SECONDS = 30
+STUDY_ROOM_TOPIC = "study_room"
+ROOM_FRAME_TYPES = {"document_ops", "document_sync", "document_update", "room_end"}
+
 
 class StudyRoomManager:
-    def __init__(self):
-        self.study_room_connections = {}
-        self.online_user_connections = {}
-        self.connections = {}
+    """
+    Study room websocket hub.
+
+    Every live room is owned by exactly one node of the message bus, which
+    holds its LiveRoom and applies its document operations. Frames for rooms
+    owned elsewhere are forwarded to the owner, and messages are published
+    to the other nodes as well, since a user may have connections on several.
+    A user can hold any number of connections, each with its own id, and
+    acknowledgements go to the connection that sent the operation.
+    """
+
+    def __init__(self, bus: Optional[MessageBus] = None):
+        self.connections: Dict[str, Dict[str, Connection]] = {}
+        self.rooms: Dict[str, LiveRoom] = {}
+        self.connection_rooms: Dict[str, Set[str]] = {}
+        self.room_owners: Dict[str, Tuple[str, float]] = {}
+        self._loading_rooms: Dict[str, asyncio.Future] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.attach_bus(bus or InMemoryMessageBus())
 
-    async def connect(self, websocket: WebSocket, user_id: str):
+    def attach_bus(self, bus: MessageBus):
+        self.bus = bus
+        self.room_owners.clear()
+        bus.subscribe(STUDY_ROOM_TOPIC, self._handle_bus_message)
+        bus.subscribe(LEASE_LOST_TOPIC, self._handle_lease_lost)
+
+    async def connect(self, websocket: WebSocket, user_id: str) -> str:
         await websocket.accept()
-        self.connections[user_id] = websocket
+        connection = Connection(websocket)
+        connection.start()
+        connection_id = uuid4().hex
+        self.connections.setdefault(user_id, {})[connection_id] = connection
+        presence_manager.connect(user_id)
+        return connection_id
+
+    async def disconnect(self, user_id: str, connection_id: str):
+        user_connections = self.connections.get(user_id, {})
+        connection = user_connections.pop(connection_id, None)
+        if not user_connections:
+            self.connections.pop(user_id, None)
+        if connection:
+            await connection.close()
+            presence_manager.disconnect(user_id)
+
+        for study_room_id in self.connection_rooms.pop(connection_id, set()):
+            if not self._in_room_elsewhere(user_id, study_room_id):
+                presence_manager.leave_room(user_id, study_room_id)
+            await self._forward_leave(study_room_id, connection_id)
+
+    def _in_room_elsewhere(self, user_id: str, study_room_id: str) -> bool:
+        """Whether another connection of the user on this node has the room open."""
+
+        return any(
+            study_room_id in self.connection_rooms.get(connection_id, ())
+            for connection_id in self.connections.get(user_id, {})
+        )
+
+    async def send_message(
+        self, user_id: str, message: dict, connection_id: Optional[str] = None
+    ):
+        """Send a message to one connection of a user, or to all of them."""
+
+        await self.deliver([user_id], message, connection_id=connection_id)
+
+    def broadcast(
+        self,
+        user_ids: Iterable[str],
+        message: dict,
+        connection_id: Optional[str] = None,
+        exclude_connection_id: Optional[str] = None,
+    ):
+        """
+        Queue one encoded copy of the message on every connection of the
+        recipients held by this node.
+        """
+
+        text = None
+        for user_id in user_ids:
+            for current_id, connection in self.connections.get(user_id, {}).items():
+                if current_id == exclude_connection_id or (
+                    connection_id and current_id != connection_id
+                ):
+                    continue
+                if text is None:
+                    text = encode_message(message)
+                connection.enqueue(text)
+
+    async def deliver(
+        self,
+        user_ids: Iterable[str],
+        message: dict,
+        connection_id: Optional[str] = None,
+        exclude_connection_id: Optional[str] = None,
+    ):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        self.broadcast(user_ids, message, connection_id, exclude_connection_id)
+        if connection_id and any(
+            connection_id in self.connections.get(user_id, {}) for user_id in user_ids
+        ):
+            return
+        await self.bus.publish(
+            STUDY_ROOM_TOPIC,
+            {
+                "type": "deliver",
+                "user_ids": user_ids,
+                "message": message,
+                "connection_id": connection_id,
+                "exclude_connection_id": exclude_connection_id,
+            },
+        )
+
+    async def deliver_to_room(
+        self,
+        room: LiveRoom,
+        message: dict,
+        exclude_connection_id: Optional[str] = None,
+    ):
+        await self.deliver(
+            room.active_participant_ids(),
+            message,
+            exclude_connection_id=exclude_connection_id,
+        )
+
+    async def handle_frame(self, user_id: str, connection_id: str, data: dict):
+        if data["type"] not in ROOM_FRAME_TYPES:
+            return
+
+        study_room_id = data["data"]["study_room_id"]
+        owner = await self._room_owner(study_room_id)
+        if owner == self.bus.node_id:
+            await self._handle_room_frame(user_id, connection_id, data)
+        else:
+            await self.bus.publish(
+                STUDY_ROOM_TOPIC,
+                {
+                    "type": "frame",
+                    "user_id": user_id,
+                    "connection_id": connection_id,
+                    "node_id": self.bus.node_id,
+                    "frame": data,
+                },
+                node_id=owner,
+            )
+
+    async def _room_owner(self, study_room_id: str) -> str:
+        if study_room_id in self.rooms:
+            return self.bus.node_id
+
+        cached = self.room_owners.get(study_room_id)
+        now = time.monotonic()
+        if cached and cached[1] > now:
+            return cached[0]
+
+        owner = await self.bus.claim(study_room_id)
+        if owner == self.bus.node_id:
+            self.room_owners.pop(study_room_id, None)
+        else:
+            self.room_owners[study_room_id] = (owner, now + ROOM_OWNER_CACHE_SECONDS)
+        return owner
+
+    async def _handle_room_frame(
+        self,
+        user_id: str,
+        connection_id: str,
+        data: dict,
+        origin_node_id: Optional[str] = None,
+    ):
+        study_room_id = data["data"]["study_room_id"]
+        room = self.rooms.get(study_room_id)
+        was_member = room is not None and connection_id in room.members
+        room = await self.join_room(
+            study_room_id, user_id, connection_id, origin_node_id or self.bus.node_id
+        )
+        if (room is not None) != was_member:
+            await self._confirm_membership(
+                user_id, connection_id, study_room_id, room is not None, origin_node_id
+            )
+        if not room:
+            return
+
+        if data["type"] == "document_sync":
+            await self._send_document_resync(user_id, connection_id, room)
+        elif data["type"] == "document_ops":
+            await self._handle_document_ops(user_id, connection_id, room, data)
+        elif data["type"] == "document_update":
+            await self._handle_document_update(user_id, connection_id, room, data)
+        elif data["type"] == "room_end":
+            await self._handle_room_end(user_id, connection_id, room)
+
+    async def _confirm_membership(
+        self,
+        user_id: str,
+        connection_id: str,
+        study_room_id: str,
+        joined: bool,
+        origin_node_id: Optional[str],
+    ):
+        """Tell the node holding the connection that the owner accepted or dropped it."""
+
+        if origin_node_id is None or origin_node_id == self.bus.node_id:
+            await self._set_membership(user_id, connection_id, study_room_id, joined)
+        else:
+            await self.bus.publish(
+                STUDY_ROOM_TOPIC,
+                {
+                    "type": "membership",
+                    "user_id": user_id,
+                    "connection_id": connection_id,
+                    "study_room_id": study_room_id,
+                    "joined": joined,
+                },
+                node_id=origin_node_id,
+            )
+
+    async def _set_membership(
+        self, user_id: str, connection_id: str, study_room_id: str, joined: bool
+    ):
+        """
+        Record a confirmed join, or roll back a rejected one, for a connection
+        held by this node. Presence only follows confirmed memberships.
+        """
+
+        if not joined:
+            study_room_ids = self.connection_rooms.get(connection_id, set())
+            if study_room_id in study_room_ids:
+                study_room_ids.discard(study_room_id)
+                if not self._in_room_elsewhere(user_id, study_room_id):
+                    presence_manager.leave_room(user_id, study_room_id)
+            return
+
+        if connection_id not in self.connections.get(user_id, {}):
+            # The connection closed while the join was in flight.
+            await self._forward_leave(study_room_id, connection_id)
+            return
+        self.connection_rooms.setdefault(connection_id, set()).add(study_room_id)
+        presence_manager.enter_room(user_id, study_room_id)
+
+    async def _forward_leave(self, study_room_id: str, connection_id: str):
+        if study_room_id in self.rooms:
+            await self._leave_room(study_room_id, connection_id)
+        else:
+            await self.bus.publish(
+                STUDY_ROOM_TOPIC,
+                {
+                    "type": "leave",
+                    "study_room_id": study_room_id,
+                    "connection_id": connection_id,
+                },
+            )
+
+    async def _send_document_resync(
+        self, user_id: str, connection_id: str, room: LiveRoom
+    ):
+        await self.send_message(
+            user_id,
+            {
+                "type": "document_resync",
+                "data": {
+                    "study_room_id": room.study_room_id,
+                    "revision": room.document.revision,
+                    "content": room.document.content,
+                },
+            },
+            connection_id,
+        )
+
+    async def _handle_document_ops(
+        self, user_id: str, connection_id: str, room: LiveRoom, data: dict
+    ):
+        if not room.can_edit(user_id):
+            await self._send_document_resync(user_id, connection_id, room)
+            return
+
+        try:
+            operation = TextOperation.from_json(data["data"]["ops"])
+            operation = room.document.receive_operation(
+                data["data"]["revision"], operation
+            )
+        except (KeyError, TypeError, ValueError):
+            await self._send_document_resync(user_id, connection_id, room)
+            return
+        self.schedule_flush(room)
+
+        await self.send_message(
+            user_id,
+            {
+                "type": "document_ack",
+                "data": {
+                    "study_room_id": room.study_room_id,
+                    "revision": room.document.revision,
+                },
+            },
+            connection_id,
+        )
+
+        message = {
+            "type": "document_ops",
+            "data": {
+                "editor_id": user_id,
+                "study_room_id": room.study_room_id,
+                "revision": room.document.revision,
+                "ops": operation.to_json(),
+            },
+        }
+        await self.deliver_to_room(room, message, connection_id)
+
+    async def _handle_document_update(
+        self, user_id: str, connection_id: str, room: LiveRoom, data: dict
+    ):
+        if not room.can_edit(user_id):
+            await self._send_document_resync(user_id, connection_id, room)
+            return
+
+        room.document.replace_content(data["data"]["content"])
+        self.schedule_flush(room)
+        await self._deliver_document_update(room, user_id, connection_id)
+
+    async def _deliver_document_update(
+        self, room: LiveRoom, editor_id: str, connection_id: Optional[str] = None
+    ):
+        message = {
+            "type": "document_update",
+            "data": {
+                "editor_id": editor_id,
+                "study_room_id": room.study_room_id,
+                "revision": room.document.revision,
+                "content": room.document.content,
+            },
+        }
+        await self.deliver_to_room(room, message, connection_id)
+
+    async def _handle_room_end(self, user_id: str, connection_id: str, room: LiveRoom):
+        if not room.is_owner(user_id):
+            return
+
+        message = {
+            "type": "room_end",
+            "data": {
+                "study_room_id": room.study_room_id,
+                "message": "The study session has ended.",
+            },
+        }
+        await self.deliver_to_room(room, message, connection_id)
+        await self.close_room(room.study_room_id, force=True)
+
+    async def _handle_bus_message(self, message: dict):
+        if message["type"] == "deliver":
+            self.broadcast(
+                message["user_ids"],
+                message["message"],
+                message.get("connection_id"),
+                message.get("exclude_connection_id"),
+            )
+        elif message["type"] == "frame":
+            study_room_id = message["frame"]["data"]["study_room_id"]
+            owner = self.bus.node_id
+            if study_room_id not in self.rooms:
+                owner = await self.bus.claim(study_room_id)
+            if owner == self.bus.node_id:
+                await self._handle_room_frame(
+                    message["user_id"],
+                    message["connection_id"],
+                    message["frame"],
+                    message["node_id"],
+                )
+        elif message["type"] == "membership":
+            await self._set_membership(
+                message["user_id"],
+                message["connection_id"],
+                message["study_room_id"],
+                message["joined"],
+            )
+        elif message["type"] == "leave":
+            await self._leave_room(message["study_room_id"], message["connection_id"])
+        elif message["type"] == "participant":
+            self._upsert_participant(
+                message["study_room_id"], Participant(**message["participant"])
+            )
+        elif message["type"] == "end":
+            await self._end_room(message["study_room_id"])
+        elif message["type"] == "content":
+            await self._replace_content(
+                message["study_room_id"], message["content"], message["editor_id"]
+            )
+
+    async def _handle_lease_lost(self, message: dict):
+        room = self.rooms.get(message["key"])
+        if room:
+            print(f"Error: lost ownership of study room {room.study_room_id}")
+            self._drop_room(room)
+
+    def _drop_room(self, room: LiveRoom):
+        """
+        Forget a room whose lease another node took over, without flushing it,
+        so that only the new owner applies and persists its operations.
+        """
+
+        if room.flush_handle:
+            room.flush_handle.cancel()
+            room.flush_handle = None
+        if self.rooms.get(room.study_room_id) is room:
+            del self.rooms[room.study_room_id]
+
+    async def join_room(
+        self, study_room_id: str, user_id: str, connection_id: str, node_id: str
+    ) -> Optional[LiveRoom]:
+        """Return the live room for a connected member, loading it on first use."""
+
+        room = self.rooms.get(study_room_id)
+        if not room:
+            room = await self._load_room(study_room_id)
+        if not room or not room.is_participant(user_id):
+            if room:
+                # A participant removed from the room loses its open connections too.
+                room.members.pop(connection_id, None)
+            if not room or not room.members:
+                await self.close_room(study_room_id)
+            return None
+
+        room.members[connection_id] = node_id
+        return room
+
+    async def _leave_room(self, study_room_id: str, connection_id: str):
+        room = self.rooms.get(study_room_id)
+        if room:
+            room.members.pop(connection_id, None)
+            if not room.members:
+                await self.close_room(study_room_id)
+
+    async def sweep_members(self):
+        """
+        Drop the members held by nodes that stopped running, whose leave
+        frames will never arrive, and close rooms left without members.
+        """
+
+        if not self.rooms:
+            return
+        live_nodes = await self.bus.live_nodes()
+        for study_room_id, room in list(self.rooms.items()):
+            gone = [
+                connection_id
+                for connection_id, node_id in room.members.items()
+                if node_id not in live_nodes
+            ]
+            for connection_id in gone:
+                room.members.pop(connection_id, None)
+            if gone and not room.members:
+                await self.close_room(study_room_id)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(ROOM_MEMBER_SWEEP_SECONDS)
+            try:
+                await self.sweep_members()
+            except Exception as e:
+                print(f"Error: failed to sweep study room members: {e}")
+
+    async def start(self):
+        self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+            self._sweep_task = None
+
+    async def _load_room(self, study_room_id: str) -> Optional[LiveRoom]:
+        loading = self._loading_rooms.get(study_room_id)
+        if loading:
+            return await loading
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading_rooms[study_room_id] = loading
+        try:
+            object_id = convert_to_pydantic_object_id(study_room_id)
+            study_room, content = await asyncio.gather(
+                StudyRoom.get(object_id), StudyRoomContentRepository.read(object_id)
+            )
+            room = LiveRoom(study_room, content) if study_room else None
+            if room:
+                self.rooms[study_room_id] = room
+            loading.set_result(room)
+            return room
+        except Exception as e:
+            loading.set_exception(e)
+            raise
+        finally:
+            del self._loading_rooms[study_room_id]
+
+    async def close_room(self, study_room_id: str, force: bool = False):
+        room = self.rooms.get(study_room_id)
+        if room:
+            await self.flush_room(room)
+            if room.members and not force:
+                return
+            self.rooms.pop(study_room_id, None)
+
+        await self.bus.release(study_room_id)
+
+    async def upsert_participant(self, study_room_id: str, participant: Participant):
+        self._upsert_participant(study_room_id, participant)
+        await self.bus.publish(
+            STUDY_ROOM_TOPIC,
+            {
+                "type": "participant",
+                "study_room_id": study_room_id,
+                "participant": participant.model_dump(mode="json"),
+            },
+        )
+
+    def _upsert_participant(self, study_room_id: str, participant: Participant):
+        room = self.rooms.get(study_room_id)
+        if room:
+            room.upsert_participant(participant.model_copy())
+
+    async def end_room(self, study_room_id: str):
+        await self._end_room(study_room_id)
+        await self.bus.publish(
+            STUDY_ROOM_TOPIC, {"type": "end", "study_room_id": study_room_id}
+        )
+
+    async def _end_room(self, study_room_id: str):
+        room = self.rooms.get(study_room_id)
+        if room:
+            room.is_active = False
+            await self.flush_room(room)
+
+    def get_live_content(self, study_room_id: str) -> Optional[str]:
+        room = self.rooms.get(study_room_id)
+        return room.document.content if room else None
+
+    async def replace_content(self, study_room_id: str, content: str, editor_id: str):
+        await self._replace_content(study_room_id, content, editor_id)
+        await self.bus.publish(
+            STUDY_ROOM_TOPIC,
+            {
+                "type": "content",
+                "study_room_id": study_room_id,
+                "content": content,
+                "editor_id": editor_id,
+            },
+        )
+
+    async def _replace_content(self, study_room_id: str, content: str, editor_id: str):
+        room = self.rooms.get(study_room_id)
+        if not room:
+            return
+
+        async with room.flush_lock:
+            room.document.replace_content(content)
+            # The content was written to storage directly, possibly while a
+            # flush was in flight, so the next flush rewrites every chunk
+            # instead of diffing against a snapshot that no longer matches.
+            room.persisted_content = None
+        self.schedule_flush(room)
+        await self._deliver_document_update(room, editor_id)
+
+    def schedule_flush(self, room: LiveRoom):
+        """Debounce a content write, bounded by the maximum flush interval."""
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if room.dirty_since is None:
+            room.dirty_since = now
+
+        delay = min(
+            CONTENT_FLUSH_DEBOUNCE_SECONDS,
+            room.dirty_since + CONTENT_FLUSH_MAX_INTERVAL_SECONDS - now,
+        )
+        if room.flush_handle:
+            room.flush_handle.cancel()
+        room.flush_handle = loop.call_later(max(delay, 0), self._start_flush, room)
+
+    def _start_flush(self, room: LiveRoom):
+        room.flush_handle = None
+        task = asyncio.create_task(self.flush_room(room))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush_room(self, room: LiveRoom):
+        async with room.flush_lock:
+            if room.flush_handle:
+                room.flush_handle.cancel()
+                room.flush_handle = None
+
+            if not room.is_dirty:
+                room.dirty_since = None
+                return
+
+            revision = room.document.revision
+            content = room.document.content
+            room.dirty_since = None
+            try:
+                if not await self.bus.holds(room.study_room_id):
+                    print(f"Error: lost ownership of study room {room.study_room_id}")
+                    self._drop_room(room)
+                    return
+                await StudyRoomContentRepository.write(
+                    convert_to_pydantic_object_id(room.study_room_id),
+                    content,
+                    previous=room.persisted_content,
+                )
+            except Exception as e:
+                print(f"Error: failed to persist study room {room.study_room_id}: {e}")
+                self.schedule_flush(room)
+                return
+
+            room.persisted_revision = revision
+            room.persisted_content = content
+            if room.is_dirty:
+                self.schedule_flush(room)
+
+    async def flush_all(self):
+        for room in list(self.rooms.values()):
+            await self.flush_room(room)
 
-    async def disconnect(self, user_id: str):
-        if user_id in self.connections:
-            del self.connections[user_id]
 
-    async def send_message(self, user_id: str, message: dict):
-        websocket = self.connections.get(user_id)
-        if websocket:
-            await websocket.send_json(message)
+study_room_manager = StudyRoomManager()
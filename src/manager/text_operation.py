@@ -0,0 +1,227 @@
+from typing import List, Optional, Tuple, Union
+
+Component = Union[int, str]
+
+
+class TextOperation:
+    """
+    An operation over a plain text document made of retain (positive int),
+    insert (str) and delete (negative int) components. Lengths count
+    unicode code points.
+    """
+
+    def __init__(self):
+        self.ops: List[Component] = []
+        self.base_length = 0
+        self.target_length = 0
+
+    @staticmethod
+    def is_retain(op: Optional[Component]) -> bool:
+        return isinstance(op, int) and not isinstance(op, bool) and op > 0
+
+    @staticmethod
+    def is_insert(op: Optional[Component]) -> bool:
+        return isinstance(op, str)
+
+    @staticmethod
+    def is_delete(op: Optional[Component]) -> bool:
+        return isinstance(op, int) and not isinstance(op, bool) and op < 0
+
+    def retain(self, n: int) -> "TextOperation":
+        if n == 0:
+            return self
+        self.base_length += n
+        self.target_length += n
+        if self.ops and self.is_retain(self.ops[-1]):
+            self.ops[-1] += n
+        else:
+            self.ops.append(n)
+        return self
+
+    def insert(self, text: str) -> "TextOperation":
+        if text == "":
+            return self
+        self.target_length += len(text)
+        if self.ops and self.is_insert(self.ops[-1]):
+            self.ops[-1] += text
+        elif self.ops and self.is_delete(self.ops[-1]):
+            # Keep inserts in front of deletes so equal operations compare equal.
+            if len(self.ops) > 1 and self.is_insert(self.ops[-2]):
+                self.ops[-2] += text
+            else:
+                self.ops.insert(len(self.ops) - 1, text)
+        else:
+            self.ops.append(text)
+        return self
+
+    def delete(self, n: int) -> "TextOperation":
+        if n == 0:
+            return self
+        if n > 0:
+            n = -n
+        self.base_length -= n
+        if self.ops and self.is_delete(self.ops[-1]):
+            self.ops[-1] += n
+        else:
+            self.ops.append(n)
+        return self
+
+    def is_noop(self) -> bool:
+        return not self.ops or (len(self.ops) == 1 and self.is_retain(self.ops[0]))
+
+    @classmethod
+    def from_json(cls, ops: list) -> "TextOperation":
+        if not isinstance(ops, list):
+            raise ValueError("Operation must be a list of components")
+
+        operation = cls()
+        for op in ops:
+            if cls.is_retain(op):
+                operation.retain(op)
+            elif cls.is_insert(op):
+                operation.insert(op)
+            elif cls.is_delete(op):
+                operation.delete(op)
+            else:
+                raise ValueError(f"Invalid operation component: {op!r}")
+        return operation
+
+    def to_json(self) -> List[Component]:
+        return list(self.ops)
+
+    def apply(self, document: str) -> str:
+        if len(document) != self.base_length:
+            raise ValueError("Operation base length does not match the document")
+
+        parts = []
+        index = 0
+        for op in self.ops:
+            if self.is_retain(op):
+                parts.append(document[index : index + op])
+                index += op
+            elif self.is_insert(op):
+                parts.append(op)
+            else:
+                index -= op
+        return "".join(parts)
+
+    @classmethod
+    def replace(cls, old: str, new: str) -> "TextOperation":
+        """Build the smallest single-span operation turning `old` into `new`."""
+
+        prefix = 0
+        max_prefix = min(len(old), len(new))
+        while prefix < max_prefix and old[prefix] == new[prefix]:
+            prefix += 1
+
+        suffix = 0
+        max_suffix = max_prefix - prefix
+        while suffix < max_suffix and old[-suffix - 1] == new[-suffix - 1]:
+            suffix += 1
+
+        return (
+            cls()
+            .retain(prefix)
+            .delete(len(old) - prefix - suffix)
+            .insert(new[prefix : len(new) - suffix])
+            .retain(suffix)
+        )
+
+    @classmethod
+    def transform(
+        cls, a: "TextOperation", b: "TextOperation"
+    ) -> Tuple["TextOperation", "TextOperation"]:
+        """
+        Transform two concurrent operations applied to the same document so
+        that apply(apply(doc, a), b') == apply(apply(doc, b), a').
+        """
+
+        if a.base_length != b.base_length:
+            raise ValueError("Concurrent operations must share a base length")
+
+        a_prime, b_prime = cls(), cls()
+        ops1, ops2 = a.ops, b.ops
+        i1 = i2 = 0
+        op1 = ops1[0] if ops1 else None
+        op2 = ops2[0] if ops2 else None
+
+        def next_op1():
+            nonlocal i1
+            i1 += 1
+            return ops1[i1] if i1 < len(ops1) else None
+
+        def next_op2():
+            nonlocal i2
+            i2 += 1
+            return ops2[i2] if i2 < len(ops2) else None
+
+        while op1 is not None or op2 is not None:
+            if cls.is_insert(op1):
+                a_prime.insert(op1)
+                b_prime.retain(len(op1))
+                op1 = next_op1()
+                continue
+            if cls.is_insert(op2):
+                a_prime.retain(len(op2))
+                b_prime.insert(op2)
+                op2 = next_op2()
+                continue
+
+            if op1 is None or op2 is None:
+                raise ValueError("Operations have different lengths")
+
+            if cls.is_retain(op1) and cls.is_retain(op2):
+                if op1 > op2:
+                    length = op2
+                    op1 -= op2
+                    op2 = next_op2()
+                elif op1 == op2:
+                    length = op2
+                    op1 = next_op1()
+                    op2 = next_op2()
+                else:
+                    length = op1
+                    op2 -= op1
+                    op1 = next_op1()
+                a_prime.retain(length)
+                b_prime.retain(length)
+            elif cls.is_delete(op1) and cls.is_delete(op2):
+                if -op1 > -op2:
+                    op1 -= op2
+                    op2 = next_op2()
+                elif op1 == op2:
+                    op1 = next_op1()
+                    op2 = next_op2()
+                else:
+                    op2 -= op1
+                    op1 = next_op1()
+            elif cls.is_delete(op1) and cls.is_retain(op2):
+                if -op1 > op2:
+                    length = op2
+                    op1 += op2
+                    op2 = next_op2()
+                elif -op1 == op2:
+                    length = op2
+                    op1 = next_op1()
+                    op2 = next_op2()
+                else:
+                    length = -op1
+                    op2 += op1
+                    op1 = next_op1()
+                a_prime.delete(length)
+            else:
+                if op1 > -op2:
+                    length = -op2
+                    op1 += op2
+                    op2 = next_op2()
+                elif op1 == -op2:
+                    length = op1
+                    op1 = next_op1()
+                    op2 = next_op2()
+                else:
+                    length = op1
+                    op2 += op1
+                    op1 = next_op1()
+                b_prime.delete(length)
+
+        return a_prime, b_prime
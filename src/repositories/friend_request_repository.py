@@ -1,5 +1,13 @@
-from typing import List
-from src.documents.friend_request import FriendRequest
+from datetime import datetime
+from typing import List, Optional
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from src.documents.friend_request import (
+    FriendRequest,
+    FriendRequestStatus,
+    friend_request_pair_key,
+)
 
 
 class FriendRequestRepository:
@@ -8,3 +16,71 @@ class FriendRequestRepository:
     async def search_by_query(query: dict) -> List[FriendRequest]:
         friend_requests = await FriendRequest.find_many(query).to_list()
         return friend_requests
+
+    @staticmethod
+    async def create_pending(
+        sender_id: PydanticObjectId, receiver_id: PydanticObjectId
+    ) -> Optional[FriendRequest]:
+        """Insert a pending request, returning None if one is already pending between the users."""
+
+        friend_request = FriendRequest(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            status=FriendRequestStatus.PENDING,
+            pair_key=friend_request_pair_key(sender_id, receiver_id),
+            created_at=datetime.now(),
+        )
+        try:
+            await friend_request.insert()
+        except DuplicateKeyError:
+            return None
+        return friend_request
+
+    @staticmethod
+    async def respond(
+        request_id: PydanticObjectId,
+        receiver_id: PydanticObjectId,
+        new_status: FriendRequestStatus,
+    ) -> Optional[FriendRequest]:
+        """
+        Move a pending request addressed to the receiver to its answer in one
+        step, returning None when no such pending request exists.
+        """
+
+        document = await FriendRequest.get_motor_collection().find_one_and_update(
+            {
+                "_id": request_id,
+                "receiver_id": receiver_id,
+                "status": FriendRequestStatus.PENDING.value,
+            },
+            {"$set": {"status": new_status.value, "responded_at": datetime.now()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            return None
+        return FriendRequest(**document)
+
+    @staticmethod
+    async def backfill_pair_keys():
+        """Give pending requests stored before pair keys existed their key."""
+
+        collection = FriendRequest.get_motor_collection()
+        cursor = collection.find(
+            {
+                "status": FriendRequestStatus.PENDING.value,
+                "pair_key": {"$exists": False},
+            },
+            {"sender_id": 1, "receiver_id": 1},
+        )
+        async for friend_request in cursor:
+            pair_key = friend_request_pair_key(
+                friend_request["sender_id"], friend_request["receiver_id"]
+            )
+            try:
+                await collection.update_one(
+                    {"_id": friend_request["_id"]}, {"$set": {"pair_key": pair_key}}
+                )
+            except DuplicateKeyError:
+                print(
+                    f"Warning: friend request {friend_request['_id']} duplicates a pending request, leaving it without a pair key"
+                )
@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Set
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.constants import DUPLICATE_KEY_ERROR_CODE
+from src.documents.friendship import Friendship
+from src.documents.user_document import UserDocument
+
+LEGACY_FRIEND_FIELDS = ("friends", "friend_requests_sent", "friend_requests_received")
+
+
+class FriendshipRepository:
+    @staticmethod
+    async def are_friends(
+        user_id: PydanticObjectId, friend_id: PydanticObjectId
+    ) -> bool:
+        edge = await Friendship.get_motor_collection().find_one(
+            {"user_id": user_id, "friend_id": friend_id}, {"_id": 1}
+        )
+        return edge is not None
+
+    @staticmethod
+    async def add(user_id: PydanticObjectId, friend_id: PydanticObjectId) -> bool:
+        """Store both edges of a friendship, returning False if it already existed."""
+
+        created_at = datetime.now(timezone.utc)
+        try:
+            result = await Friendship.get_motor_collection().bulk_write(
+                [
+                    UpdateOne(
+                        {"user_id": a, "friend_id": b},
+                        {"$setOnInsert": {"created_at": created_at}},
+                        upsert=True,
+                    )
+                    for a, b in ((user_id, friend_id), (friend_id, user_id))
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            # Concurrent upserts of the same edge race on the unique index,
+            # and the loser finds the edge already stored by the winner.
+            errors = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors") or any(
+                error.get("code") != DUPLICATE_KEY_ERROR_CODE for error in errors
+            ):
+                raise
+            return e.details.get("nUpserted", 0) > 0
+        return result.upserted_count > 0
+
+    @staticmethod
+    async def remove(user_id: PydanticObjectId, friend_id: PydanticObjectId) -> bool:
+        """Delete both edges of a friendship, returning False if there was none."""
+
+        result = await Friendship.get_motor_collection().delete_many(
+            {
+                "$or": [
+                    {"user_id": user_id, "friend_id": friend_id},
+                    {"user_id": friend_id, "friend_id": user_id},
+                ]
+            }
+        )
+        return result.deleted_count > 0
+
+    @staticmethod
+    async def list_friend_ids(
+        user_id: PydanticObjectId, before_id: Optional[PydanticObjectId], limit: int
+    ) -> List[PydanticObjectId]:
+        query = {"user_id": user_id}
+        if before_id:
+            query["friend_id"] = {"$lt": before_id}
+
+        cursor = (
+            Friendship.get_motor_collection()
+            .find(query, {"_id": 0, "friend_id": 1})
+            .sort("friend_id", -1)
+            .limit(limit)
+        )
+        return [PydanticObjectId(edge["friend_id"]) async for edge in cursor]
+
+    @staticmethod
+    async def filter_friends(
+        user_id: PydanticObjectId, candidate_ids: Iterable[PydanticObjectId]
+    ) -> Set[PydanticObjectId]:
+        """Return which of the candidates are friends of the user."""
+
+        cursor = Friendship.get_motor_collection().find(
+            {"user_id": user_id, "friend_id": {"$in": list(candidate_ids)}},
+            {"_id": 0, "friend_id": 1},
+        )
+        return {PydanticObjectId(edge["friend_id"]) async for edge in cursor}
+
+    @staticmethod
+    async def backfill_from_user_arrays():
+        """Move friend lists still embedded in user documents into edges."""
+
+        users = UserDocument.get_motor_collection()
+        legacy_query = {
+            "$or": [{field: {"$exists": True}} for field in LEGACY_FRIEND_FIELDS]
+        }
+        async for user in users.find(legacy_query, {"friends": 1}):
+            for friend_id in user.get("friends") or []:
+                await FriendshipRepository.add(user["_id"], friend_id)
+            await users.update_one(
+                {"_id": user["_id"]},
+                {"$unset": {field: "" for field in LEGACY_FRIEND_FIELDS}},
+            )
@@ -0,0 +1,126 @@
+from typing import AsyncIterator, List, Optional
+from beanie import PydanticObjectId
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import BulkWriteError
+from src.constants import DUPLICATE_KEY_ERROR_CODE
+from src.documents.study_room import StudyRoom
+from src.documents.study_room_content import StudyRoomContentChunk
+
+CONTENT_CHUNK_SIZE = 16 * 1024
+
+
+class StudyRoomContentRepository:
+    """
+    Study room content stored as fixed size chunks, apart from the room
+    document. Writes only touch the chunks that changed.
+
+    A write is not atomic across chunks, so a read that runs during a flush
+    can see new chunks next to old ones. While a room is live its current
+    content comes from StudyRoomManager.get_live_content instead.
+    """
+
+    @staticmethod
+    def split(content: str) -> List[str]:
+        return [
+            content[start : start + CONTENT_CHUNK_SIZE]
+            for start in range(0, len(content), CONTENT_CHUNK_SIZE)
+        ]
+
+    @staticmethod
+    async def stream(study_room_id: PydanticObjectId) -> AsyncIterator[str]:
+        """Yield the content of a study room chunk by chunk."""
+
+        found = False
+        async for chunk in StudyRoomContentChunk.find(
+            StudyRoomContentChunk.study_room_id == study_room_id
+        ).sort("+index"):
+            found = True
+            yield chunk.data
+
+        if not found:
+            legacy = await StudyRoomContentRepository._migrate_legacy_content(
+                study_room_id
+            )
+            if legacy:
+                yield legacy
+
+    @staticmethod
+    async def read(study_room_id: PydanticObjectId) -> str:
+        chunks = StudyRoomContentRepository.stream(study_room_id)
+        return "".join([chunk async for chunk in chunks])
+
+    @staticmethod
+    async def write(
+        study_room_id: PydanticObjectId,
+        content: str,
+        previous: Optional[str] = None,
+    ):
+        """
+        Store the content of a study room. When the previously stored content
+        is known, unchanged chunks are skipped.
+        """
+
+        chunks = StudyRoomContentRepository.split(content)
+        previous_chunks = (
+            StudyRoomContentRepository.split(previous) if previous is not None else None
+        )
+
+        requests = [
+            UpdateOne(
+                {"study_room_id": study_room_id, "index": index},
+                {"$set": {"data": data}},
+                upsert=True,
+            )
+            for index, data in enumerate(chunks)
+            if previous_chunks is None
+            or index >= len(previous_chunks)
+            or previous_chunks[index] != data
+        ]
+        if previous_chunks is None or len(previous_chunks) > len(chunks):
+            requests.append(
+                DeleteMany(
+                    {"study_room_id": study_room_id, "index": {"$gte": len(chunks)}}
+                )
+            )
+
+        if requests:
+            await StudyRoomContentChunk.get_motor_collection().bulk_write(
+                requests, ordered=False
+            )
+
+    @staticmethod
+    async def _migrate_legacy_content(study_room_id: PydanticObjectId) -> str:
+        """Move content still embedded in a study room document into chunks."""
+
+        collection = StudyRoom.get_motor_collection()
+        legacy = await collection.find_one(
+            {"_id": study_room_id, "content": {"$exists": True}}, {"content": 1}
+        )
+        if not legacy:
+            return ""
+
+        content = legacy["content"] or ""
+        # Another reader may have migrated the content already and a live room
+        # may have flushed newer chunks since, which must not be overwritten.
+        requests = [
+            UpdateOne(
+                {"study_room_id": study_room_id, "index": index},
+                {"$setOnInsert": {"data": data}},
+                upsert=True,
+            )
+            for index, data in enumerate(StudyRoomContentRepository.split(content))
+        ]
+        if requests:
+            try:
+                await StudyRoomContentChunk.get_motor_collection().bulk_write(
+                    requests, ordered=False
+                )
+            except BulkWriteError as e:
+                # Concurrent migrations race on the unique chunk index.
+                errors = e.details.get("writeErrors", [])
+                if e.details.get("writeConcernErrors") or any(
+                    error.get("code") != DUPLICATE_KEY_ERROR_CODE for error in errors
+                ):
+                    raise
+        await collection.update_one({"_id": study_room_id}, {"$unset": {"content": ""}})
+        return content
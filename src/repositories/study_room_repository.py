@@ -0,0 +1,214 @@
+from typing import Iterable, List, Optional
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+from src.documents.study_room import StudyRoom
+from src.documents.user_document import UserDocument
+from src.schemas.participant import Participant, Permission
+from src.schemas.study_room import StudyRoomListingProjection, StudyRoomSummary
+
+
+def _active_participant(user_id: PydanticObjectId, **conditions) -> dict:
+    return {
+        "participants": {
+            "$elemMatch": {"user_id": user_id, "is_active": True, **conditions}
+        }
+    }
+
+
+class StudyRoomRepository:
+    @staticmethod
+    async def list_for_participant(
+        user_id: PydanticObjectId, before_id: Optional[PydanticObjectId], limit: int
+    ) -> List[StudyRoomListingProjection]:
+        """
+        List the rooms a user takes part in, newest first, with their
+        participants' user summaries joined in and without ever reading the
+        room content.
+        """
+
+        match = {"participants.user_id": user_id}
+        if before_id:
+            match["_id"] = {"$lt": before_id}
+
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"_id": -1}},
+            {"$limit": limit},
+            {
+                "$project": {
+                    "name": 1,
+                    "description": 1,
+                    "participants": 1,
+                    "created_at": 1,
+                }
+            },
+            {
+                "$lookup": {
+                    "from": UserDocument.get_collection_name(),
+                    "localField": "participants.user_id",
+                    "foreignField": "_id",
+                    "pipeline": [
+                        {"$project": {"email": 1, "first_name": 1, "last_name": 1}}
+                    ],
+                    "as": "participant_users",
+                }
+            },
+        ]
+        return await StudyRoom.aggregate(
+            pipeline, projection_model=StudyRoomListingProjection
+        ).to_list()
+
+    @staticmethod
+    async def get_summaries_by_ids(
+        ids: Iterable[PydanticObjectId],
+    ) -> List[StudyRoomSummary]:
+        """Retrieve the listing fields of several rooms with a single query."""
+
+        return (
+            await StudyRoom.find({"_id": {"$in": list(ids)}})
+            .project(StudyRoomSummary)
+            .to_list()
+        )
+
+    @staticmethod
+    async def _update_participant(
+        query: dict,
+        update: dict,
+        user_id: PydanticObjectId,
+        array_filters: Optional[List[dict]] = None,
+    ) -> Optional[Participant]:
+        """
+        Apply a conditional update to a room and return the given user's
+        participant entry as it is afterwards, or None when nothing matched.
+        """
+
+        study_room = await StudyRoom.get_motor_collection().find_one_and_update(
+            query,
+            update,
+            projection={"participants": {"$elemMatch": {"user_id": user_id}}},
+            array_filters=array_filters,
+            return_document=ReturnDocument.AFTER,
+        )
+        if not study_room or not study_room.get("participants"):
+            return None
+        return Participant(**study_room["participants"][0])
+
+    @staticmethod
+    async def add_participant(
+        study_room_id: PydanticObjectId, user_id: PydanticObjectId
+    ) -> Optional[Participant]:
+        """
+        Join an active room as a viewer. A user who left the room earlier is
+        reactivated instead of being added a second time.
+        """
+
+        participant = await StudyRoomRepository._update_participant(
+            {
+                "_id": study_room_id,
+                "is_active": True,
+                "participants.user_id": {"$ne": user_id},
+            },
+            {
+                "$push": {
+                    "participants": {
+                        "user_id": user_id,
+                        "is_owner": False,
+                        "is_active": True,
+                        "permission": Permission.can_view.value,
+                    }
+                }
+            },
+            user_id,
+        )
+        if participant:
+            return participant
+
+        return await StudyRoomRepository._update_participant(
+            {
+                "_id": study_room_id,
+                "is_active": True,
+                "participants": {
+                    "$elemMatch": {"user_id": user_id, "is_active": False},
+                    "$not": {"$elemMatch": {"user_id": user_id, "is_active": True}},
+                },
+            },
+            {
+                "$set": {
+                    "participants.$[elem].is_active": True,
+                    "participants.$[elem].permission": Permission.can_view.value,
+                }
+            },
+            user_id,
+            array_filters=[{"elem.user_id": user_id}],
+        )
+
+    @staticmethod
+    async def deactivate_participant(
+        study_room_id: PydanticObjectId,
+        user_id: PydanticObjectId,
+        participant_id: PydanticObjectId,
+    ) -> Optional[Participant]:
+        """Mark a participant inactive, on their own behalf or the owner's."""
+
+        conditions = [_active_participant(participant_id)]
+        if user_id != participant_id:
+            conditions.append(_active_participant(user_id, is_owner=True))
+
+        return await StudyRoomRepository._update_participant(
+            {"_id": study_room_id, "$and": conditions},
+            {"$set": {"participants.$[elem].is_active": False}},
+            participant_id,
+            array_filters=[{"elem.user_id": participant_id}],
+        )
+
+    @staticmethod
+    async def set_participant_permission(
+        study_room_id: PydanticObjectId,
+        user_id: PydanticObjectId,
+        participant_id: PydanticObjectId,
+        permission: Permission,
+    ) -> Optional[Participant]:
+        """Change a participant's permission in an active room owned by the user."""
+
+        return await StudyRoomRepository._update_participant(
+            {
+                "_id": study_room_id,
+                "is_active": True,
+                "$and": [
+                    _active_participant(user_id, is_owner=True),
+                    {
+                        "participants": {
+                            "$elemMatch": {
+                                "user_id": participant_id,
+                                "permission": {"$ne": permission.value},
+                            }
+                        }
+                    },
+                ],
+            },
+            {"$set": {"participants.$[elem].permission": permission.value}},
+            participant_id,
+            array_filters=[{"elem.user_id": participant_id}],
+        )
+
+    @staticmethod
+    async def end(
+        study_room_id: PydanticObjectId, user_id: PydanticObjectId
+    ) -> Optional[Participant]:
+        """End an active room owned by the user, who leaves it at the same time."""
+
+        return await StudyRoomRepository._update_participant(
+            {
+                "_id": study_room_id,
+                "is_active": True,
+                **_active_participant(user_id, is_owner=True),
+            },
+            {
+                "$set": {
+                    "is_active": False,
+                    "participants.$[elem].is_active": False,
+                }
+            },
+            user_id,
+            array_filters=[{"elem.user_id": user_id}],
+        )
@@ -0,0 +1,43 @@
+from typing import Dict, Iterable, Optional, Set
+from beanie import PydanticObjectId
+from src.repositories.user_repository import UserRepository
+from src.schemas.user import UserSummary
+
+
+class UserLoader:
+    """
+    Request scoped user loader. Ids are collected with `prime` and resolved
+    together with one query on the next load, and results are kept for the
+    rest of the request.
+    """
+
+    def __init__(self):
+        self._users: Dict[PydanticObjectId, Optional[UserSummary]] = {}
+        self._pending: Set[PydanticObjectId] = set()
+
+    def prime(self, user_ids: Iterable[PydanticObjectId]):
+        for user_id in user_ids:
+            if user_id not in self._users:
+                self._pending.add(user_id)
+
+    async def load_many(
+        self, user_ids: Iterable[PydanticObjectId]
+    ) -> Dict[PydanticObjectId, Optional[UserSummary]]:
+        user_ids = list(user_ids)
+        self.prime(user_ids)
+        await self._resolve()
+        return {user_id: self._users[user_id] for user_id in user_ids}
+
+    async def load(self, user_id: PydanticObjectId) -> Optional[UserSummary]:
+        return (await self.load_many([user_id]))[user_id]
+
+    async def _resolve(self):
+        if not self._pending:
+            return
+
+        user_ids = list(self._pending)
+        self._pending.clear()
+        users = await UserRepository.get_summaries_by_ids(user_ids)
+
+        self._users.update(dict.fromkeys(user_ids))
+        self._users.update({user.id: user for user in users})
@@ -1,7 +1,8 @@
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 from beanie import PydanticObjectId
+from src.cache.user_search import user_search_cache
 from src.documents.user_document import UserDocument
-from src.schemas.user import UserCreate, UserUpdate
+from src.schemas.user import UserCreate, UserUpdate, UserSummary
 
 
 class UserRepository:
@@ -39,6 +40,61 @@ class UserRepository:
 
         return await UserDocument.get(id)
 
+    @staticmethod
+    async def get_summaries_by_ids(
+        ids: Iterable[PydanticObjectId],
+    ) -> List[UserSummary]:
+        """Retrieve the public fields of several users with a single query."""
+
+        return (
+            await UserDocument.find({"_id": {"$in": list(ids)}})
+            .project(UserSummary)
+            .to_list()
+        )
+
+    @staticmethod
+    async def search_by_key_among_ids(
+        ids: Iterable[PydanticObjectId],
+        key: str,
+        before_id: Optional[PydanticObjectId],
+        limit: int,
+    ) -> List[UserSummary]:
+        """Retrieve the given users holding a search key, newest ids first."""
+
+        id_filter = {"$in": list(ids)}
+        if before_id:
+            id_filter["$lt"] = before_id
+        return (
+            await UserDocument.find({"search_keys": key, "_id": id_filter})
+            .sort("-_id")
+            .limit(limit)
+            .project(UserSummary)
+            .to_list()
+        )
+
+    @staticmethod
+    async def find_search_candidates(key: str, limit: int) -> List[UserSummary]:
+        """Retrieve users holding a search key, in email order, caching the result."""
+
+        candidates = user_search_cache.get(key)
+        if candidates is None:
+            candidates = (
+                await UserDocument.find({"search_keys": key})
+                .sort("+email")
+                .limit(limit)
+                .project(UserSummary)
+                .to_list()
+            )
+            user_search_cache.set(key, candidates)
+        return candidates
+
+    @staticmethod
+    async def backfill_search_keys():
+        """Compute search keys for users stored before they existed."""
+
+        async for user in UserDocument.find({"search_keys": {"$exists": False}}):
+            await user.save()
+
     @staticmethod
     async def create(user_data: UserCreate):
         """Create a new user document and save it to the database."""
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, status, Response
+from typing import Optional
+from fastapi import APIRouter, Cookie, Depends, Request, status, Response
+from src.auth.admission import admission_controller
 from src.controllers.auth_controller import AuthController
 from src.services.user_service import UserService
-from src.auth.token_manager import TokenManager
+from src.auth.token_manager import TokenManager, oauth2_scheme, token_manager
 from src.schemas.user import UserCreate, UserLogin
 from src.schemas.token import TokenData
 
@@ -17,10 +19,19 @@ def get_user_service() -> UserService:
 
 
 def get_token_manager() -> TokenManager:
-    return TokenManager()
+    return token_manager
 
 
-@router.post("/register", status_code=status.HTTP_201_CREATED)
+async def admit_auth_request(request: Request):
+    async with admission_controller.admit(admission_controller.client_ip(request)):
+        yield
+
+
+@router.post(
+    "/register",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit_auth_request)],
+)
 async def register(
     user: UserCreate,
     auth_controller: AuthController = Depends(get_auth_controller),
@@ -29,7 +40,7 @@ async def register(
     return await auth_controller.register(user, user_service)
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(admit_auth_request)])
 async def login(
     response: Response,
     user_credentials: UserLogin,
@@ -44,17 +55,26 @@ async def login(
 
 @router.post("/logout")
 async def logout(
+    response: Response,
+    refresh_token: Optional[str] = Cookie(None),
     token: TokenData = Depends(get_token_manager().get_current_user),
+    access_token: str = Depends(oauth2_scheme),
+    token_manager: TokenManager = Depends(get_token_manager),
     auth_controller: AuthController = Depends(get_auth_controller),
 ):
 
-    return await auth_controller.logout(token)
+    return await auth_controller.logout(
+        response, access_token, refresh_token, token_manager
+    )
 
 
 @router.post("/refresh")
 async def refresh(
     response: Response,
+    refresh_token: Optional[str] = Cookie(None),
     token_manager: TokenManager = Depends(get_token_manager),
     auth_controller: AuthController = Depends(get_auth_controller),
 ):
-    return await auth_controller.refresh_token(response, token_manager)
+    return await auth_controller.refresh_token(
+        response, refresh_token, token_manager
+    )
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, status
 from typing import Optional
+from src.constants import DEFAULT_PAGE_LIMIT
 from src.schemas.token import TokenData
-from src.auth.token_manager import TokenManager
+from src.auth.token_manager import TokenManager, token_manager
 from src.services.user_service import UserService
 from src.controllers.friend_request_controller import FriendRequestController
 
@@ -17,12 +18,14 @@ def get_user_service() -> UserService:
 
 
 def get_token_manager() -> TokenManager:
-    return TokenManager()
+    return token_manager
 
 
 @router.get("")
 async def get_received_friend_requests(
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
     token: TokenData = Depends(get_token_manager().get_current_user),
     friend_request_controller: FriendRequestController = Depends(
         get_friend_request_controller
@@ -31,7 +34,7 @@ async def get_received_friend_requests(
 ):
     user_id = token.id
     return await friend_request_controller.get_received_requests(
-        user_id, status, user_service
+        user_id, status, user_service, cursor, limit
     )
 
 
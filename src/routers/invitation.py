@@ -1,9 +1,11 @@
+from typing import Optional
 from fastapi import APIRouter, status, Depends
 
-from src.auth.token_manager import TokenManager
+from src.constants import DEFAULT_PAGE_LIMIT
+
+from src.auth.token_manager import TokenManager, token_manager
 from src.controllers.invitation_controller import InvitationController
 from src.services.study_room_service import StudyRoomService
-from src.services.user_service import UserService
 
 from src.schemas.token import TokenData
 from src.schemas.invitation import InvitationCreate
@@ -19,24 +21,21 @@ def get_study_room_service() -> StudyRoomService:
     return StudyRoomService()
 
 
-def get_user_service() -> UserService:
-    return UserService()
-
-
 def get_token_manager() -> TokenManager:
-    return TokenManager()
+    return token_manager
 
 
 @router.get("")
 async def get_received_invitations(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
     token: TokenData = Depends(get_token_manager().get_current_user),
     invitation_controller: InvitationController = Depends(get_invitation_controller),
     study_room_service: StudyRoomService = Depends(get_study_room_service),
-    user_service: UserService = Depends(get_user_service),
 ):
     current_user_id = token.id
     return await invitation_controller.get_received_invitations(
-        current_user_id, study_room_service, user_service
+        current_user_id, study_room_service, cursor, limit
     )
 
 
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+
+from src.auth.token_manager import TokenManager, token_manager
+from src.controllers.metrics_controller import MetricsController
+from src.schemas.token import TokenData
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+def get_metrics_controller() -> MetricsController:
+    return MetricsController()
+
+
+def get_token_manager() -> TokenManager:
+    return token_manager
+
+
+@router.get("")
+async def get_metrics(
+    token: TokenData = Depends(get_token_manager().get_current_user),
+    metrics_controller: MetricsController = Depends(get_metrics_controller),
+):
+    return await metrics_controller.get_metrics()
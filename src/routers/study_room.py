@@ -1,14 +1,13 @@
 import datetime
-import json
-from src.manager import study_room_manager
-from src.manager.study_room_manager import StudyRoomManager
+from typing import Optional
+from src.constants import DEFAULT_PAGE_LIMIT
+from src.manager.connection import decode_message
+from src.manager.study_room_manager import StudyRoomManager, study_room_manager
 from src.documents import study_room
-from src.documents.study_room import StudyRoom
 from src.schemas.participant import Permission
-from src.utils import convert_to_pydantic_object_id, convert_to_str
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 
-from src.auth.token_manager import TokenManager
+from src.auth.token_manager import TokenManager, token_manager
 
 from src.controllers.study_room_controller import StudyRoomController
 
@@ -24,10 +23,7 @@ def get_study_room_controller() -> StudyRoomController:
 
 
 def get_token_manager() -> TokenManager:
-    return TokenManager()
-
-
-study_room_manager = StudyRoomManager()
+    return token_manager
 
 
 def get_study_room_manager() -> StudyRoomManager:
@@ -48,11 +44,15 @@ async def create_study_room(
 
 @router.get("")
 async def list_study_rooms(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
     token: TokenData = Depends(get_token_manager().get_current_user),
     study_room_controller: StudyRoomController = Depends(get_study_room_controller),
 ):
     current_user_id = token.id
-    return await study_room_controller.list_study_rooms(current_user_id)
+    return await study_room_controller.list_study_rooms(
+        current_user_id, cursor, limit
+    )
 
 
 @router.get("/{study_room_id}")
@@ -67,6 +67,18 @@ async def retrieve_study_room(
     )
 
 
+@router.get("/{study_room_id}/content")
+async def stream_study_room_content(
+    study_room_id: str,
+    token: TokenData = Depends(get_token_manager().get_current_user),
+    study_room_controller: StudyRoomController = Depends(get_study_room_controller),
+):
+    current_user_id = token.id
+    return await study_room_controller.stream_study_room_content(
+        current_user_id, study_room_id
+    )
+
+
 @router.put("/{study_room_id}")
 async def update_study_room(
     study_room_id: str,
@@ -131,12 +143,14 @@ async def update_participant_permission(
 async def search_invitation_by_room(
     study_room_id: str,
     query: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
     token: TokenData = Depends(get_token_manager().get_current_user),
     study_room_controller: StudyRoomController = Depends(get_study_room_controller),
 ):
     current_user_id = token.id
     return await study_room_controller.search_invitation_by_room(
-        current_user_id, study_room_id, query
+        current_user_id, study_room_id, query, cursor, limit
     )
 
 
@@ -145,60 +159,23 @@ async def websocket_endpoint(
     websocket: WebSocket,
     study_room_manager: StudyRoomManager = Depends(get_study_room_manager),
 ):
-    current_user_id = websocket.query_params.get("user_id")
+    # The live room enforces edit and owner permissions on this id, so it must
+    # come from a verified token rather than from the client.
+    current_user_id = get_token_manager()._decode_token(
+        websocket.query_params.get("token", "")
+    )
     if not current_user_id:
         await websocket.close(code=4001)
         return
 
-    await study_room_manager.connect(websocket, current_user_id)
-
-    async def handle_document_update(data):
-        study_room_id = data["data"]["study_room_id"]
-        study_room = await StudyRoom.get(convert_to_pydantic_object_id(study_room_id))
-        message = {
-            "type": "document_update",
-            "data": {
-                "editor_id": current_user_id,
-                "study_room_id": study_room_id,
-                "content": data["data"]["content"],
-            },
-        }
-        await notify_participants(study_room, current_user_id, message)
-
-    async def handle_room_end(data):
-        study_room_id = data["data"]["study_room_id"]
-        study_room = await StudyRoom.get(convert_to_pydantic_object_id(study_room_id))
-        message = {
-            "type": "room_end",
-            "data": {
-                "study_room_id": study_room_id,
-                "message": "The study session has ended.",
-            },
-        }
-        await notify_participants(study_room, current_user_id, message)
-
-    async def notify_participants(study_room, editor_id, message):
-        for participant in study_room.participants:
-            if (
-                participant.is_active
-                and participant.user_id != convert_to_pydantic_object_id(editor_id)
-            ):
-                await study_room_manager.send_message(
-                    convert_to_str(participant.user_id), message=message
-                )
+    connection_id = await study_room_manager.connect(websocket, current_user_id)
 
     try:
         while True:
             message = await websocket.receive_text()
-            data = json.loads(message)
-            if data["type"] == "document_update":
-                await handle_document_update(data)
-            elif data["type"] == "room_end":
-                await handle_room_end(data)
+            data = decode_message(message)
+            await study_room_manager.handle_frame(current_user_id, connection_id, data)
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        if current_user_id in study_room_manager.connections:
-            await study_room_manager.disconnect(current_user_id)
-        else:
-            print(f"Warning: user {current_user_id} was not found in the connections.")
+        await study_room_manager.disconnect(current_user_id, connection_id)
@@ -1,6 +1,12 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, status
+from src.constants import (
+    DEFAULT_PAGE_LIMIT,
+    FRIEND_SUGGESTION_LIMIT,
+    USER_SEARCH_LIMIT,
+)
 from src.controllers.user_controller import UserController
-from src.auth.token_manager import TokenManager
+from src.auth.token_manager import TokenManager, token_manager
 from src.schemas.token import TokenData
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -11,16 +17,17 @@ def get_user_controller() -> UserController:
 
 
 def get_token_manager() -> TokenManager:
-    return TokenManager()
+    return token_manager
 
 
 @router.get("/search")
 async def search_users(
     query: str,
+    limit: int = USER_SEARCH_LIMIT,
     token: TokenData = Depends(get_token_manager().verify_token),
     user_controller: UserController = Depends(get_user_controller),
 ):
-    return await user_controller.search_users(query, token)
+    return await user_controller.search_users(query, token, limit)
 
 
 @router.get("/current")
@@ -34,11 +41,32 @@ async def get_user_info(
 
 @router.get("/friends")
 async def get_user_friends(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
     token: TokenData = Depends(get_token_manager().get_current_user),
     user_controller: UserController = Depends(get_user_controller),
 ):
     user_id = token.id
-    return await user_controller.get_user_friends(user_id)
+    return await user_controller.get_user_friends(user_id, cursor, limit)
+
+
+@router.get("/friends/suggestions")
+async def get_friend_suggestions(
+    limit: int = FRIEND_SUGGESTION_LIMIT,
+    token: TokenData = Depends(get_token_manager().get_current_user),
+    user_controller: UserController = Depends(get_user_controller),
+):
+    user_id = token.id
+    return await user_controller.get_friend_suggestions(user_id, limit)
+
+
+@router.get("/friends/presence")
+async def get_friends_presence(
+    token: TokenData = Depends(get_token_manager().get_current_user),
+    user_controller: UserController = Depends(get_user_controller),
+):
+    user_id = token.id
+    return await user_controller.get_friends_presence(user_id)
 
 
 @router.post("/friends/{friend_id}", status_code=status.HTTP_201_CREATED)
@@ -1,8 +1,10 @@
 from datetime import datetime
 from typing import Optional, List
+from beanie import PydanticObjectId
 from pydantic import BaseModel, Field
 
-from src.schemas.participant import ParticipantOut
+from src.schemas.participant import Participant, ParticipantOut
+from src.schemas.user import UserSummary
 
 
 class StudyRoomCreate(BaseModel):
@@ -23,6 +25,18 @@ class StudyRoomListingOut(BaseModel):
         orm_mode = True
 
 
+class StudyRoomSummary(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    description: str
+    participants: List[Participant]
+    created_at: datetime
+
+
+class StudyRoomListingProjection(StudyRoomSummary):
+    participant_users: List[UserSummary]
+
+
 class StudyRoomDetailOut(StudyRoomListingOut):
     content: str
     is_active: bool
@@ -1,5 +1,6 @@
 from typing import Optional
-from pydantic import BaseModel, EmailStr
+from beanie import PydanticObjectId
+from pydantic import BaseModel, EmailStr, Field
 from src.documents.friend_request import FriendRequestStatus
 
 
@@ -26,6 +27,7 @@ class UserSearch(UserBase):
     last_name: str
     is_friend: bool
     friend_request_status: FriendRequestStatus
+    mutual_friends: int = 0
 
 
 class UserLogin(UserBase):
@@ -39,3 +41,14 @@ class UserInfo(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class UserSummary(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    email: EmailStr
+    first_name: str
+    last_name: str
+
+
+class UserSuggestion(UserSummary):
+    mutual_friends: int
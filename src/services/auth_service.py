@@ -1,8 +1,10 @@
+from typing import Optional
 from fastapi import HTTPException, status, Response
-from src.documents.blacklist_token import BlackListToken
+from src.auth.revocation import token_revocation_list
 from src.documents.user_document import UserDocument
 from src.schemas.user import UserCreate, UserLogin
-from src.utils import hash_password, verify_password
+from src.auth.admission import admission_controller
+from src.auth.password_hasher import password_hasher
 from src.services.user_service import UserService
 from src.auth.token_manager import TokenManager
 
@@ -18,9 +20,19 @@ class AuthService:
             samesite="strict",
         )
 
+    @staticmethod
+    def _clear_refresh_token(response: Response):
+        response.delete_cookie(
+            key="refresh_token",
+            httponly=True,
+            secure=True,
+            samesite="strict",
+        )
+
     @staticmethod
     async def register(user: UserCreate, user_service: UserService) -> None:
         """Register a new user, ensuring the email is unique."""
+        admission_controller.check_account(user.email)
         existing_user = await user_service.get_user_by_email(user.email)
         if existing_user:
             raise HTTPException(
@@ -28,7 +40,7 @@ class AuthService:
                 detail="Email already registered",
             )
 
-        hashed_password = hash_password(password=user.password)
+        hashed_password = await password_hasher.hash(user.password)
 
         new_user = UserDocument(
             email=user.email,
@@ -46,14 +58,25 @@ class AuthService:
         token_manager: TokenManager,
     ) -> dict:
         """Authenticate user and return access token while setting refresh token as HttpOnly cookie."""
+        admission_controller.check_account(user_login.email)
         existing_user = await user_service.get_user_by_email(user_login.email)
-        if not existing_user or not verify_password(
-            plain_password=user_login.password, hashed_password=existing_user.password
-        ):
+        if not existing_user:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials"
             )
 
+        is_valid, new_hash = await password_hasher.verify_and_update(
+            user_login.password, existing_user.password
+        )
+        if not is_valid:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials"
+            )
+        if new_hash:
+            await UserDocument.find_one({"_id": existing_user.id}).update(
+                {"$set": {"password": new_hash}}
+            )
+
         access_token = token_manager.create_access_token(
             {"user_id": str(existing_user.id)}
         )
@@ -66,23 +89,41 @@ class AuthService:
         return access_token
 
     @staticmethod
-    async def blacklist_token(token: str) -> None:
-        """Blacklist the token for logout."""
+    async def blacklist_token(
+        token: str,
+        refresh_token: Optional[str],
+        response: Response,
+        token_manager: TokenManager,
+    ) -> None:
+        """Blacklist the access token and the session's refresh token for logout."""
 
         if not token:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Token missing or malformed",
             )
-        token = BlackListToken(token=token)
-        await token.insert()
+        user_id = token_manager.get_user_id(token)
+        await token_revocation_list.revoke(token, token_manager.get_expiry(token))
+        token_manager.forget_token(token)
+
+        # Otherwise the refresh cookie could keep minting access tokens.
+        if (
+            refresh_token
+            and token_manager.verify_refresh_token(refresh_token) == user_id
+        ):
+            await token_revocation_list.revoke(
+                refresh_token, token_manager.get_expiry(refresh_token)
+            )
+            token_manager.forget_token(refresh_token)
+        AuthService._clear_refresh_token(response)
 
     async def refresh_token(
-        self, response: Response, token_manager: TokenManager
+        self,
+        response: Response,
+        refresh_token: Optional[str],
+        token_manager: TokenManager,
     ) -> str:
         """Validate the refresh token, generate a new access token, and rotate the refresh token."""
-        refresh_token = response.request.cookies.get("refresh_token")
-
         if not refresh_token:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,6 +143,11 @@ class AuthService:
             data={"user_id": user_id}
         )
 
+        # The rotated token must not keep working alongside the new one.
+        await token_revocation_list.revoke(
+            refresh_token, token_manager.get_expiry(refresh_token)
+        )
+        token_manager.forget_token(refresh_token)
         self._set_refresh_token(response, new_refresh_token)
 
         return new_access_token
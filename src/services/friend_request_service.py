@@ -1,19 +1,34 @@
+import asyncio
 from fastapi import HTTPException, status
-from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from beanie import PydanticObjectId
 from src.documents.friend_request import FriendRequest, FriendRequestStatus
-from src.documents.user_document import UserDocument
+from src.manager.friend_graph import friend_graph
+from src.repositories.friend_request_repository import FriendRequestRepository
+from src.repositories.friendship_repository import FriendshipRepository
+from src.repositories.user_repository import UserRepository
 from src.services.user_service import UserService
-from src.utils import validate_object_id, convert_to_pydantic_object_id
+from src.utils import (
+    validate_object_id,
+    convert_to_pydantic_object_id,
+    validate_page_limit,
+    decode_cursor,
+    paginate,
+)
 
 
 class FriendRequestService:
 
     @staticmethod
     async def get_received_requests(
-        user_id: str, status: Optional[str], user_service: UserService
-    ) -> List[dict]:
+        user_id: str,
+        status: Optional[str],
+        user_service: UserService,
+        cursor: Optional[str],
+        limit: int,
+    ) -> Tuple[List[dict], Optional[str]]:
         validate_object_id(user_id)
+        validate_page_limit(limit)
 
         upper_case_status = None
 
@@ -32,12 +47,25 @@ class FriendRequestService:
         query = {FriendRequest.receiver_id: user_object_id}
         if upper_case_status:
             query[FriendRequest.status] = status
+        before_id = decode_cursor(cursor)
+        if before_id:
+            query[FriendRequest.id] = {"$lt": before_id}
 
-        received_requests = await FriendRequest.find_many(query).to_list()
+        received_requests = (
+            await FriendRequest.find_many(query).sort("-_id").limit(limit + 1).to_list()
+        )
+        received_requests, next_cursor = paginate(
+            received_requests, limit, lambda friend_request: friend_request.id
+        )
+
+        senders = await UserRepository.get_summaries_by_ids(
+            {friend_request.sender_id for friend_request in received_requests}
+        )
+        senders_by_id = {sender.id: sender for sender in senders}
 
         requests_with_senders = []
         for friend_request in received_requests:
-            sender_user = await UserDocument.get(friend_request.sender_id)
+            sender_user = senders_by_id.get(friend_request.sender_id)
             if sender_user:
                 friend_request_data = {
                     "_id": str(friend_request.id),
@@ -55,7 +83,7 @@ class FriendRequestService:
                 }
                 requests_with_senders.append(friend_request_data)
 
-        return requests_with_senders
+        return requests_with_senders, next_cursor
 
     @staticmethod
     async def send_friend_request(
@@ -67,81 +95,43 @@ class FriendRequestService:
         from_user_object_id = convert_to_pydantic_object_id(from_user_id)
         to_user_object_id = convert_to_pydantic_object_id(to_user_id)
 
-        from_user = await user_service.get_user_by_id(from_user_object_id)
-        to_user = await user_service.get_user_by_id(to_user_object_id)
-
-        if user_service.check_if_already_friends(
-            to_user, from_user_object_id
-        ) or user_service.check_if_already_friends(from_user, to_user_object_id):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="You are already friends with this user",
-            )
-
-        existing_request = await FriendRequest.find_one(
-            FriendRequest.sender_id == from_user_object_id,
-            FriendRequest.receiver_id == to_user_object_id,
-            FriendRequest.status == FriendRequestStatus.PENDING,
+        _, already_friends = await asyncio.gather(
+            user_service.get_user_by_id(to_user_object_id),
+            user_service.check_if_already_friends(
+                from_user_object_id, to_user_object_id
+            ),
         )
-        if existing_request:
+        if already_friends:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="A friend request already exists between these users",
+                detail="You are already friends with this user",
             )
 
-        existing_request = await FriendRequest.find_one(
-            FriendRequest.receiver_id == from_user_object_id,
-            FriendRequest.sender_id == to_user_object_id,
-            FriendRequest.status == FriendRequestStatus.PENDING,
+        friend_request = await FriendRequestRepository.create_pending(
+            from_user_object_id, to_user_object_id
         )
-        if existing_request:
+        if not friend_request:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="A friend request already exists between these users",
             )
 
-        friend_request = FriendRequest(
-            sender_id=from_user_object_id,
-            receiver_id=to_user_object_id,
-            status=FriendRequestStatus.PENDING,
-        )
-        await friend_request.insert()
-
-        from_user.friend_requests_sent.append(friend_request.id)
-        to_user.friend_requests_received.append(friend_request.id)
-        await from_user.save()
-        await to_user.save()
-
         return friend_request
 
     @staticmethod
-    async def update_request_status(
-        user_id: str, request_id: str, new_status: str, user_service: UserService
+    def raise_invalid_transition(
+        friend_request: Optional[FriendRequest],
+        user_object_id: PydanticObjectId,
+        valid_state: FriendRequestStatus,
     ):
-        validate_object_id(request_id)
-
-        upper_case_status = new_status.upper()
-        valid_state = FriendRequestStatus.__members__.get(upper_case_status)
-        if not valid_state:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status"
-            )
+        """Explain why a request could not be moved to the given state."""
 
-        request_object_id = convert_to_pydantic_object_id(request_id)
-        friend_request = await FriendRequest.get(request_object_id)
         if not friend_request:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Friend request not found"
             )
 
-        user_object_id = convert_to_pydantic_object_id(user_id)
-
-        user = await user_service.get_user_by_id(user_object_id)
-
-        if (
-            convert_to_pydantic_object_id(request_id)
-            not in user.friend_requests_received
-        ):
+        if friend_request.receiver_id != user_object_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You are not authorized to update this friend request",
@@ -153,51 +143,63 @@ class FriendRequestService:
                 detail="The request is already in the desired state",
             )
 
-        if (
-            friend_request.status
-            in {FriendRequestStatus.ACCEPTED, FriendRequestStatus.REJECTED}
-            and upper_case_status == "PENDING"
-        ):
+        if valid_state == FriendRequestStatus.PENDING:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cannot revert to pending from accepted or rejected",
             )
 
-        if (
-            friend_request.status == FriendRequestStatus.REJECTED
-            and upper_case_status == "ACCEPTED"
-        ):
+        if friend_request.status == FriendRequestStatus.REJECTED:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cannot accept a rejected friend request",
             )
 
-        if (
-            friend_request.status == FriendRequestStatus.ACCEPTED
-            and upper_case_status == "REJECTED"
-        ):
+        if friend_request.status == FriendRequestStatus.ACCEPTED:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cannot reject an accepted friend request",
             )
 
-        friend_request.status = valid_state
-        friend_request.responded_at = datetime.now()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The friend request was updated concurrently, please retry",
+        )
 
-        if valid_state == FriendRequestStatus.ACCEPTED:
-            existing_request = await FriendRequest.find_one(
-                FriendRequest.receiver_id == friend_request.sender_id,
-                FriendRequest.sender_id == friend_request.receiver_id,
-                FriendRequest.status == FriendRequestStatus.PENDING,
+    @staticmethod
+    async def update_request_status(
+        user_id: str, request_id: str, new_status: str, user_service: UserService
+    ):
+        validate_object_id(request_id)
+
+        upper_case_status = new_status.upper()
+        valid_state = FriendRequestStatus.__members__.get(upper_case_status)
+        if not valid_state:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status"
             )
 
-            if existing_request:
-                await existing_request.delete()
+        request_object_id = convert_to_pydantic_object_id(request_id)
+        user_object_id = convert_to_pydantic_object_id(user_id)
 
-            await user_service.add_friend(
-                str(friend_request.sender_id), str(friend_request.receiver_id)
+        friend_request = None
+        if valid_state != FriendRequestStatus.PENDING:
+            friend_request = await FriendRequestRepository.respond(
+                request_object_id, user_object_id, valid_state
+            )
+        if not friend_request:
+            FriendRequestService.raise_invalid_transition(
+                await FriendRequest.get(request_object_id), user_object_id, valid_state
             )
 
-        await friend_request.save()
+        # The pending pair index rules out a reverse request still waiting,
+        # so accepting only has to store the friendship.
+        if valid_state == FriendRequestStatus.ACCEPTED:
+            await FriendshipRepository.add(
+                friend_request.sender_id, friend_request.receiver_id
+            )
+            await friend_graph.add_friendship(
+                friend_request.sender_id, friend_request.receiver_id
+            )
 
         return friend_request
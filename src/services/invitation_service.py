@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException
 from beanie import PydanticObjectId
 
@@ -8,14 +8,17 @@ from src.schemas.user import UserInfo
 
 from src.documents.invitation import Invitation
 
+from src.repositories.study_room_repository import StudyRoomRepository
 from src.schemas.study_room import StudyRoomListingOut
 from src.services.study_room_service import StudyRoomService
-from src.services.user_service import UserService
 
 from src.utils import (
     validate_object_id,
     convert_to_pydantic_object_id,
     validate_enum_status,
+    validate_page_limit,
+    decode_cursor,
+    paginate,
 )
 
 
@@ -44,36 +47,60 @@ class InvitationService:
         self,
         current_user_id: str,
         study_room_service: StudyRoomService,
-        user_service: UserService,
-    ) -> List[InvitationListOut]:
+        cursor: Optional[str],
+        limit: int,
+    ) -> Tuple[List[InvitationListOut], Optional[str]]:
         validate_object_id(current_user_id)
+        validate_page_limit(limit)
 
         current_user_object_id = PydanticObjectId(current_user_id)
 
-        invitations = await Invitation.find(
-            Invitation.invited_user_id == current_user_object_id,
-            Invitation.status == InvitationStatus.PENDING,
-        ).to_list()
+        query = {
+            "invited_user_id": current_user_object_id,
+            "status": InvitationStatus.PENDING,
+        }
+        before_id = decode_cursor(cursor)
+        if before_id:
+            query["_id"] = {"$lt": before_id}
+
+        invitations = (
+            await Invitation.find(query).sort("-_id").limit(limit + 1).to_list()
+        )
+        invitations, next_cursor = paginate(
+            invitations, limit, lambda invitation: invitation.id
+        )
+
+        study_rooms = {
+            study_room.id: study_room
+            for study_room in await StudyRoomRepository.get_summaries_by_ids(
+                {invitation.study_room_id for invitation in invitations}
+            )
+        }
+        user_loader = study_room_service.user_loader
+        user_loader.prime(invitation.inviter_user_id for invitation in invitations)
+        user_loader.prime(
+            participant.user_id
+            for study_room in study_rooms.values()
+            for participant in study_room.participants
+        )
 
         invitation_list = []
         for invitation in invitations:
-            inviter_user = await user_service.get_user_by_id(invitation.inviter_user_id)
+            study_room = study_rooms.get(invitation.study_room_id)
+            inviter_user = await user_loader.load(invitation.inviter_user_id)
+            if not study_room or not inviter_user:
+                continue
+
             inviter_user_info = UserInfo(
                 email=inviter_user.email,
                 first_name=inviter_user.first_name,
                 last_name=inviter_user.last_name,
             )
 
-            study_room = await study_room_service.get_study_room_or_404(
-                invitation.study_room_id
+            participants_out = await study_room_service.map_participants_to_out(
+                study_room.participants
             )
 
-            participants_out = [
-                await study_room_service.map_participant_to_out(participant)
-                for participant in study_room.participants
-                if participant
-            ]
-
             study_room_info = StudyRoomListingOut(
                 id=str(study_room.id),
                 name=study_room.name,
@@ -96,7 +123,7 @@ class InvitationService:
                 )
             )
 
-        return invitation_list
+        return invitation_list, next_cursor
 
     async def create_invitation(
         self,
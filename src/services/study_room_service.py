@@ -1,12 +1,19 @@
+import asyncio
 from fastapi import HTTPException
 from beanie import PydanticObjectId
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 
-from src.documents.user_document import UserDocument
 from src.documents.study_room import StudyRoom
 from src.documents.invitation import Invitation
+from src.manager.friend_graph import friend_graph
+from src.manager.study_room_manager import study_room_manager
+from src.repositories.study_room_content_repository import (
+    StudyRoomContentRepository,
+)
+from src.repositories.study_room_repository import StudyRoomRepository
+from src.repositories.user_loader import UserLoader
+from src.repositories.user_repository import UserRepository
 
-from src.schemas.invitation import InvitationStatus
 from src.schemas.participant import (
     Permission,
     ParticipantCreate,
@@ -19,13 +26,30 @@ from src.schemas.study_room import (
     StudyRoomDetailOut,
     StudyRoomUpdate,
 )
-
-from src.utils import convert_to_pydantic_object_id, validate_object_id
+from src.schemas.user import UserSummary
+
+from src.constants import SEARCH_KEY_MAX_LENGTH
+from src.utils import (
+    convert_to_pydantic_object_id,
+    normalize_search_term,
+    rank_user_match,
+    decode_cursor,
+    paginate,
+    validate_object_id,
+    validate_page_limit,
+)
 
 PARTICIPANTS_USER_ID_FIELD = "participants.user_id"
 
 
+async def iter_content_chunks(content: str) -> AsyncIterator[str]:
+    for chunk in StudyRoomContentRepository.split(content):
+        yield chunk
+
+
 class StudyRoomService:
+    def __init__(self):
+        self.user_loader = UserLoader()
 
     async def get_study_room_or_404(self, study_room_id: PydanticObjectId) -> StudyRoom:
 
@@ -34,6 +58,14 @@ class StudyRoomService:
             raise HTTPException(status_code=404, detail="Study room not found")
         return study_room
 
+    async def get_study_room_content(self, study_room_id: str) -> str:
+        live_content = study_room_manager.get_live_content(study_room_id)
+        if live_content is not None:
+            return live_content
+        return await StudyRoomContentRepository.read(
+            convert_to_pydantic_object_id(study_room_id)
+        )
+
     def ensure_study_room_is_active(self, study_room: StudyRoom):
         if not study_room.is_active:
             raise HTTPException(status_code=403, detail="The study room is not active")
@@ -53,6 +85,13 @@ class StudyRoomService:
                 detail="You don't have permissions to perform this action",
             )
 
+    @staticmethod
+    def raise_concurrent_update():
+        raise HTTPException(
+            status_code=409,
+            detail="The study room was modified concurrently, please try again",
+        )
+
     def find_participant(
         self, study_room: StudyRoom, user_id: PydanticObjectId
     ) -> Participant:
@@ -83,19 +122,32 @@ class StudyRoomService:
         return participant is not None and participant.is_owner
 
     @staticmethod
-    async def map_participant_to_out(participant: Participant) -> ParticipantOut | None:
-        user = await UserDocument.get(participant.user_id)
-        if user:
-            return ParticipantOut(
-                user_id=participant.user_id,
-                is_owner=participant.is_owner,
-                is_active=participant.is_active,
-                permission=participant.permission,
-                email=user.email,
-                first_name=user.first_name,
-                last_name=user.last_name,
-            )
-        return None
+    def map_participant_to_out(
+        participant: Participant, user: UserSummary
+    ) -> ParticipantOut:
+        return ParticipantOut(
+            user_id=participant.user_id,
+            is_owner=participant.is_owner,
+            is_active=participant.is_active,
+            permission=participant.permission,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+        )
+
+    async def map_participants_to_out(
+        self, participants: List[Participant]
+    ) -> List[ParticipantOut]:
+        """Hydrate participants through the request's user loader, skipping deleted users."""
+
+        users = await self.user_loader.load_many(
+            participant.user_id for participant in participants
+        )
+        return [
+            self.map_participant_to_out(participant, users[participant.user_id])
+            for participant in participants
+            if users[participant.user_id]
+        ]
 
     @staticmethod
     def find_participant_by_user_id(
@@ -139,37 +191,40 @@ class StudyRoomService:
         )
 
         await new_study_room.insert()
-        participants_out = [
-            await self.map_participant_to_out(participant)
-            for participant in new_study_room.participants
-            if participant
-        ]
+        participants_out = await self.map_participants_to_out(
+            new_study_room.participants
+        )
 
         return StudyRoomDetailOut(
             id=str(new_study_room.id),
             name=new_study_room.name,
             description=new_study_room.description,
             participants=participants_out,
-            content=new_study_room.content,
+            content="",
             is_active=new_study_room.is_active,
             created_at=new_study_room.created_at,
             ended_at=new_study_room.ended_at,
         )
 
-    async def list_study_rooms(self, current_user_id: str) -> List[StudyRoomListingOut]:
+    async def list_study_rooms(
+        self, current_user_id: str, cursor: Optional[str], limit: int
+    ) -> Tuple[List[StudyRoomListingOut], Optional[str]]:
         validate_object_id(current_user_id)
+        validate_page_limit(limit)
 
         current_user_object_id = convert_to_pydantic_object_id(current_user_id)
-        rooms = await StudyRoom.find(
-            {PARTICIPANTS_USER_ID_FIELD: current_user_object_id}
-        ).to_list()
+        rooms = await StudyRoomRepository.list_for_participant(
+            current_user_object_id, decode_cursor(cursor), limit + 1
+        )
+        rooms, next_cursor = paginate(rooms, limit, lambda room: room.id)
 
         study_rooms_with_participants = []
         for room in rooms:
+            users = {user.id: user for user in room.participant_users}
             participants_out = [
-                await self.map_participant_to_out(participant)
+                self.map_participant_to_out(participant, users[participant.user_id])
                 for participant in room.participants
-                if participant
+                if participant.user_id in users
             ]
 
             study_rooms_with_participants.append(
@@ -181,7 +236,7 @@ class StudyRoomService:
                     participants=participants_out,
                 )
             )
-        return study_rooms_with_participants
+        return study_rooms_with_participants, next_cursor
 
     async def retrieve_study_room(
         self, current_user_id: str, study_room_id: str
@@ -193,18 +248,17 @@ class StudyRoomService:
 
         study_room = await self.get_study_room_or_404(study_room_object_id)
 
-        participants_out = [
-            await self.map_participant_to_out(participant)
-            for participant in study_room.participants
-            if participant
-        ]
+        participants_out, content = await asyncio.gather(
+            self.map_participants_to_out(study_room.participants),
+            self.get_study_room_content(study_room_id),
+        )
 
         return StudyRoomDetailOut(
             id=str(study_room.id),
             name=study_room.name,
             description=study_room.description,
             participants=participants_out,
-            content=study_room.content,
+            content=content,
             is_active=study_room.is_active,
             created_at=study_room.created_at,
             ended_at=study_room.ended_at,
@@ -225,12 +279,23 @@ class StudyRoomService:
         self.ensure_user_is_participant(current_user_object_id, study_room)
         self.ensure_user_is_owner(current_user_object_id, study_room)
 
-        for key, value in update_data.model_dump(exclude_unset=True).items():
+        changes = update_data.model_dump(exclude_unset=True)
+        content = changes.pop("content", None)
+        for key, value in changes.items():
             setattr(study_room, key, value)
 
-        await study_room.save()
+        await study_room.save_changes()
+        if content is not None:
+            await StudyRoomContentRepository.write(study_room_object_id, content)
+            await study_room_manager.replace_content(
+                study_room_id, content, current_user_id
+            )
+        if not study_room.is_active:
+            await study_room_manager.end_room(study_room_id)
 
-    async def end_study_room(self, current_user_id: str, study_room_id: str):
+    async def stream_study_room_content(
+        self, current_user_id: str, study_room_id: str
+    ) -> AsyncIterator[str]:
         validate_object_id(current_user_id)
         validate_object_id(study_room_id)
 
@@ -238,18 +303,34 @@ class StudyRoomService:
         study_room_object_id = convert_to_pydantic_object_id(study_room_id)
 
         study_room = await self.get_study_room_or_404(study_room_object_id)
-
-        self.ensure_study_room_is_active(study_room)
         self.ensure_user_is_participant(current_user_object_id, study_room)
-        self.ensure_user_is_owner(current_user_object_id, study_room)
-        current_user_participant = self.find_participant(
-            study_room, current_user_object_id
-        )
 
-        current_user_participant.is_active = False
-        study_room.is_active = False
+        live_content = study_room_manager.get_live_content(study_room_id)
+        if live_content is not None:
+            return iter_content_chunks(live_content)
+        return StudyRoomContentRepository.stream(study_room_object_id)
 
-        await study_room.save()
+    async def end_study_room(self, current_user_id: str, study_room_id: str):
+        validate_object_id(current_user_id)
+        validate_object_id(study_room_id)
+
+        current_user_object_id = convert_to_pydantic_object_id(current_user_id)
+        study_room_object_id = convert_to_pydantic_object_id(study_room_id)
+
+        current_user_participant = await StudyRoomRepository.end(
+            study_room_object_id, current_user_object_id
+        )
+        if not current_user_participant:
+            study_room = await self.get_study_room_or_404(study_room_object_id)
+            self.ensure_study_room_is_active(study_room)
+            self.ensure_user_is_participant(current_user_object_id, study_room)
+            self.ensure_user_is_owner(current_user_object_id, study_room)
+            self.raise_concurrent_update()
+
+        await study_room_manager.upsert_participant(
+            study_room_id, current_user_participant
+        )
+        await study_room_manager.end_room(study_room_id)
 
     async def add_participant(self, current_user_id: str, study_room_id: str):
         validate_object_id(current_user_id)
@@ -258,9 +339,6 @@ class StudyRoomService:
         current_user_object_id = convert_to_pydantic_object_id(current_user_id)
         study_room_object_id = convert_to_pydantic_object_id(study_room_id)
 
-        study_room = await self.get_study_room_or_404(study_room_object_id)
-        self.ensure_study_room_is_active(study_room)
-
         is_participant_in_other_room = await StudyRoom.find_one(
             {
                 PARTICIPANTS_USER_ID_FIELD: current_user_object_id,
@@ -275,20 +353,20 @@ class StudyRoomService:
                 detail="You are already a participant in another study room",
             )
 
-        if self.is_user_participant(current_user_object_id, study_room):
-            raise HTTPException(
-                status_code=403, detail="You are already participant of this study room"
-            )
-
-        study_room.participants.append(
-            Participant(
-                user_id=current_user_id,
-                is_owner=False,
-                is_active=True,
-                permission=Permission.can_view,
-            )
+        participant = await StudyRoomRepository.add_participant(
+            study_room_object_id, current_user_object_id
         )
-        await study_room.save()
+        if not participant:
+            study_room = await self.get_study_room_or_404(study_room_object_id)
+            self.ensure_study_room_is_active(study_room)
+            if self.is_user_participant(current_user_object_id, study_room):
+                raise HTTPException(
+                    status_code=403,
+                    detail="You are already participant of this study room",
+                )
+            self.raise_concurrent_update()
+
+        await study_room_manager.upsert_participant(study_room_id, participant)
 
     async def remove_participant(
         self, current_user_id: str, study_room_id: str, participant_id: str
@@ -301,27 +379,21 @@ class StudyRoomService:
         study_room_object_id = convert_to_pydantic_object_id(study_room_id)
         participant_object_id = convert_to_pydantic_object_id(participant_id)
 
-        study_room = await self.get_study_room_or_404(study_room_object_id)
-
-        self.ensure_user_is_participant(current_user_object_id, study_room)
-        self.ensure_user_is_participant(participant_object_id, study_room)
-
-        participant = self.find_participant(study_room, participant_object_id)
-        current_user_participant = self.find_participant(
-            study_room, current_user_object_id
+        participant = await StudyRoomRepository.deactivate_participant(
+            study_room_object_id, current_user_object_id, participant_object_id
         )
+        if not participant:
+            study_room = await self.get_study_room_or_404(study_room_object_id)
+            self.ensure_user_is_participant(current_user_object_id, study_room)
+            self.ensure_user_is_participant(participant_object_id, study_room)
+            if not self.is_user_owner(study_room, current_user_object_id):
+                raise HTTPException(
+                    status_code=403,
+                    detail="Only the owner or the participant themselves can remove the participant",
+                )
+            self.raise_concurrent_update()
 
-        if not (
-            current_user_participant.is_owner
-            or current_user_object_id == current_user_participant.user_id
-        ):
-            raise HTTPException(
-                status_code=403,
-                detail="Only the owner or the participant themselves can remove the participant",
-            )
-
-        participant.is_active = False
-        await study_room.save()
+        await study_room_manager.upsert_participant(study_room_id, participant)
 
     async def update_participant_permission(
         self,
@@ -341,71 +413,98 @@ class StudyRoomService:
         participant_object_id = convert_to_pydantic_object_id(participant_id)
         study_room_object_id = convert_to_pydantic_object_id(study_room_id)
 
-        study_room = await self.get_study_room_or_404(study_room_object_id)
-
-        self.ensure_study_room_is_active(study_room)
-        self.ensure_user_is_participant(current_user_object_id, study_room)
-        self.ensure_user_is_owner(current_user_object_id, study_room)
-
-        participant = self.find_participant(study_room, participant_object_id)
-
-        if participant.permission == permission:
-            raise HTTPException(
-                status_code=400,
-                detail="The new permission is the same as the current permission",
+        participant = await StudyRoomRepository.set_participant_permission(
+            study_room_object_id,
+            current_user_object_id,
+            participant_object_id,
+            Permission(permission),
+        )
+        if not participant:
+            study_room = await self.get_study_room_or_404(study_room_object_id)
+            self.ensure_study_room_is_active(study_room)
+            self.ensure_user_is_participant(current_user_object_id, study_room)
+            self.ensure_user_is_owner(current_user_object_id, study_room)
+            current_participant = self.find_participant(
+                study_room, participant_object_id
             )
+            if current_participant.permission == permission:
+                raise HTTPException(
+                    status_code=400,
+                    detail="The new permission is the same as the current permission",
+                )
+            self.raise_concurrent_update()
 
-        participant.permission = permission
-        await study_room.save()
+        await study_room_manager.upsert_participant(study_room_id, participant)
 
     async def search_invitation_by_room(
-        self, current_user_id: str, study_room_id: str, query: str
+        self,
+        current_user_id: str,
+        study_room_id: str,
+        query: str,
+        cursor: Optional[str],
+        limit: int,
     ):
         validate_object_id(current_user_id)
         validate_object_id(study_room_id)
+        validate_page_limit(limit)
 
         current_user_object_id = convert_to_pydantic_object_id(current_user_id)
         study_room_object_id = convert_to_pydantic_object_id(study_room_id)
 
-        current_user = await UserDocument.get(current_user_object_id)
-        if not current_user:
-            raise ValueError("Current user not found.")
-
-        users = await UserDocument.find_many(
-            {
-                "email": {"$regex": query, "$options": "i"},
-                "_id": {"$ne": current_user_object_id},
-            }
-        ).to_list()
-
-        non_friend_users = [user for user in users if user.id in current_user.friends]
+        term = normalize_search_term(query)
+        if not term:
+            return [], None
+
+        # Friends come from the in-memory friend graph, so the users query
+        # runs on the indexed search key restricted to those ids. The key only
+        # covers the first characters of the term, so matches are filtered
+        # before slicing the page, fetching further batches until the page is
+        # full or the friends run out.
+        friend_ids = friend_graph.friend_ids(current_user_object_id)
+        users = []
+        before_id = decode_cursor(cursor)
+        while friend_ids and len(users) <= limit:
+            batch = await UserRepository.search_by_key_among_ids(
+                friend_ids, term[:SEARCH_KEY_MAX_LENGTH], before_id, limit + 1
+            )
+            users.extend(
+                user
+                for user in batch
+                if rank_user_match(term, user.email, user.first_name, user.last_name)
+                is not None
+            )
+            if len(batch) <= limit:
+                break
+            before_id = batch[-1].id
+        users, next_cursor = paginate(users, limit, lambda user: user.id)
 
         study_room = await self.get_study_room_or_404(study_room_object_id)
 
-        results = []
-        for user in non_friend_users:
-            invitation = await Invitation.find_one(
+        invitations = {
+            invitation.invited_user_id: invitation
+            for invitation in await Invitation.find(
                 Invitation.study_room_id == study_room_object_id,
-                Invitation.invited_user_id == user.id,
+                {"invited_user_id": {"$in": [user.id for user in users]}},
             )
+            .sort("+_id")
+            .to_list()
+        }
 
+        results = []
+        for user in users:
+            invitation = invitations.get(user.id)
             is_participant = self.is_user_participant(user.id, study_room)
 
-            if invitation:
-                invite_sent = invitation.status != InvitationStatus.PENDING
-            else:
-                invite_sent = False
-
             results.append(
                 {
                     "id": str(user.id),
                     "email": user.email,
                     "first_name": user.first_name,
                     "last_name": user.last_name,
-                    "invite_sent": invite_sent,
+                    "invite_sent": invitation is not None,
                     "is_participant": is_participant,
                     "invitation_status": invitation.status if invitation else None,
                 }
             )
 
-        return results
+        return results, next_cursor
@@ -1,5 +1,5 @@
 from fastapi import HTTPException, status
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from beanie import PydanticObjectId
 from pydantic import EmailStr
 
@@ -7,8 +7,26 @@ from src.documents.friend_request import FriendRequestStatus
 from src.documents.user_document import UserDocument
 from src.repositories.user_repository import UserRepository
 from src.repositories.friend_request_repository import FriendRequestRepository
-from src.schemas.user import UserSearch
-from src.utils import validate_object_id, convert_to_pydantic_object_id
+from src.repositories.friendship_repository import FriendshipRepository
+from src.manager.friend_graph import friend_graph
+from src.manager.presence import presence_manager
+from src.schemas.user import UserSearch, UserSuggestion, UserSummary
+from src.constants import (
+    FRIEND_SUGGESTION_LIMIT,
+    SEARCH_KEY_MAX_LENGTH,
+    USER_SEARCH_CANDIDATE_LIMIT,
+    USER_SEARCH_LIMIT,
+)
+from src.utils import (
+    normalize_search_term,
+    rank_user_match,
+    validate_object_id,
+    convert_to_pydantic_object_id,
+    convert_to_str,
+    validate_page_limit,
+    decode_cursor,
+    paginate,
+)
 
 
 class UserService:
@@ -17,24 +35,36 @@ class UserService:
         self.user_repository = UserRepository()
         self.friend_request_repository = FriendRequestRepository()
 
-    async def search_users(self, query: str, user_id: str) -> List[UserSearch]:
+    async def search_users(
+        self, query: str, user_id: str, limit: int = USER_SEARCH_LIMIT
+    ) -> List[UserSearch]:
         """Fetch users by search query and include if they are friends with the current user and the friend request status"""
 
         validate_object_id(user_id)
+        validate_page_limit(limit)
         user_object_id = convert_to_pydantic_object_id(user_id)
 
-        USER_SEARCH_QUERY = {
-            "email": {"$regex": query, "$options": "i"},
-            "_id": {"$ne": user_object_id},
-        }
-        users = await self.user_repository.search_by_query(USER_SEARCH_QUERY)
-        if not users:
+        term = normalize_search_term(query)
+        if not term:
             return []
 
-        current_user = await self.user_repository.get_by_id(user_object_id)
-        friend_ids = set(current_user.friends)
+        candidates = await self.user_repository.find_search_candidates(
+            term[:SEARCH_KEY_MAX_LENGTH], USER_SEARCH_CANDIDATE_LIMIT
+        )
+        ranked = []
+        for user in candidates:
+            if user.id == user_object_id:
+                continue
+            rank = rank_user_match(term, user.email, user.first_name, user.last_name)
+            if rank is not None:
+                ranked.append((rank, user))
+        ranked.sort(key=lambda match: match[0])
+        users = [user for _, user in ranked[:limit]]
+        if not users:
+            return []
 
         user_ids = [user.id for user in users]
+        friend_ids = await FriendshipRepository.filter_friends(user_object_id, user_ids)
 
         FRIEND_REQUEST_SEARCH_QUERY = {
             "sender_id": user_object_id,
@@ -46,6 +76,7 @@ class UserService:
         sent_requests_map = {
             request.receiver_id: request.status for request in sent_requests
         }
+        mutual_friends = friend_graph.mutual_friend_counts(user_object_id, user_ids)
 
         user_search_results = [
             UserSearch(
@@ -53,10 +84,11 @@ class UserService:
                 email=user.email,
                 first_name=user.first_name,
                 last_name=user.last_name,
-                is_friend=str(user.id) in friend_ids,
+                is_friend=user.id in friend_ids,
                 friend_request_status=sent_requests_map.get(
                     user.id, FriendRequestStatus.PENDING
                 ),
+                mutual_friends=mutual_friends[user.id],
             )
             for user in users
         ]
@@ -79,34 +111,70 @@ class UserService:
         """Fetch a user by email."""
         return await UserDocument.find_one({"email": user_email})
 
-    async def get_user_friends(self, user_id: str) -> List[UserDocument]:
-        """Fetch a list of friends for a given UserDocument."""
+    async def get_user_friends(
+        self, user_id: str, cursor: Optional[str], limit: int
+    ) -> Tuple[List[UserSummary], Optional[str]]:
+        """Fetch a page of friends for a given UserDocument."""
         validate_object_id(user_id)
+        validate_page_limit(limit)
         user_object_id = convert_to_pydantic_object_id(user_id)
-        user = await self.get_user_by_id(user_object_id)
-        friends = await UserDocument.find(
-            {"_id": {"$in": UserDocument.friends}}
-        ).to_list()
-        return friends
 
-    @staticmethod
-    async def update_friendship(user: UserDocument, friend: UserDocument, add: bool):
-        if add:
-            UserDocument.friends.append(friend.id)
-            friend.friends.append(UserDocument.id)
-        else:
-            UserDocument.friends.remove(friend.id)
-            friend.friends.remove(UserDocument.id)
+        friend_ids = await FriendshipRepository.list_friend_ids(
+            user_object_id, decode_cursor(cursor), limit + 1
+        )
+        friend_ids, next_cursor = paginate(
+            friend_ids, limit, lambda friend_id: friend_id
+        )
+
+        users = {
+            user.id: user
+            for user in await self.user_repository.get_summaries_by_ids(friend_ids)
+        }
+        friends = [users[friend_id] for friend_id in friend_ids if friend_id in users]
+        return friends, next_cursor
+
+    async def get_friend_suggestions(
+        self, user_id: str, limit: int = FRIEND_SUGGESTION_LIMIT
+    ) -> List[UserSuggestion]:
+        """Fetch friends of friends the user is not friends with yet, most mutual friends first."""
+        validate_object_id(user_id)
+        validate_page_limit(limit)
+        user_object_id = convert_to_pydantic_object_id(user_id)
 
-        await UserDocument.save()
-        await friend.save()
+        suggestions = friend_graph.suggest_friends(user_object_id, limit)
+        if not suggestions:
+            return []
+
+        users = {
+            user.id: user
+            for user in await self.user_repository.get_summaries_by_ids(
+                [suggested_id for suggested_id, _ in suggestions]
+            )
+        }
+        return [
+            UserSuggestion(
+                **users[suggested_id].model_dump(by_alias=True),
+                mutual_friends=mutual_friends,
+            )
+            for suggested_id, mutual_friends in suggestions
+            if suggested_id in users
+        ]
 
     @staticmethod
-    def check_if_already_friends(
-        user: UserDocument, friend_object_id: PydanticObjectId
+    def get_friends_presence(user_id: str) -> Dict[str, str]:
+        """Fetch the status of every friend of the user who is currently online."""
+        validate_object_id(user_id)
+        friend_ids = friend_graph.friend_ids(convert_to_pydantic_object_id(user_id))
+        return presence_manager.get_statuses(
+            convert_to_str(friend_id) for friend_id in friend_ids
+        )
+
+    @staticmethod
+    async def check_if_already_friends(
+        user_id: PydanticObjectId, friend_object_id: PydanticObjectId
     ) -> bool:
         """Check if two users are already friends."""
-        return friend_object_id in UserDocument.friends
+        return await FriendshipRepository.are_friends(user_id, friend_object_id)
 
     async def add_friend(self, user_id: str, friend_id: str):
         """Add a friend to a user's friend list."""
@@ -123,16 +191,14 @@ class UserService:
         user_object_id = convert_to_pydantic_object_id(user_id)
         friend_object_id = convert_to_pydantic_object_id(friend_id)
 
-        user = await self.get_user_by_id(user_object_id)
-        friend = await self.get_user_by_id(friend_object_id)
+        await self.get_user_by_id(friend_object_id)
 
-        if self.check_if_already_friends(user, friend_object_id):
+        if not await FriendshipRepository.add(user_object_id, friend_object_id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="You are already friends",
             )
-
-        await self.update_friendship(user, friend, add=True)
+        await friend_graph.add_friendship(user_object_id, friend_object_id)
 
     async def remove_friend(self, user_id: str, friend_id: str):
         """Remove a friend from a user's friend list."""
@@ -149,13 +215,9 @@ class UserService:
         user_object_id = convert_to_pydantic_object_id(user_id)
         friend_object_id = convert_to_pydantic_object_id(friend_id)
 
-        user = await self.get_user_by_id(user_object_id)
-        friend = await self.get_user_by_id(friend_object_id)
-
-        if not self.check_if_already_friends(user, friend_object_id):
+        if not await FriendshipRepository.remove(user_object_id, friend_object_id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="You are not friends with this user",
             )
-
-        await self.update_friendship(user, friend, add=False)
+        await friend_graph.remove_friendship(user_object_id, friend_object_id)
@@ -1,15 +1,32 @@
+import base64
+import binascii
+import unicodedata
 from copyreg import constructor
 from enum import Enum
 from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from passlib.context import CryptContext
+from pydantic_core import to_json
 from bson import ObjectId
 from beanie import PydanticObjectId
-from typing import Any, Dict, Optional, Type
-from src.constants import RESPONSE_STATUS_ERROR
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+from src.constants import (
+    RESPONSE_STATUS_ERROR,
+    MAX_PAGE_LIMIT,
+    PASSWORD_HASH_ROUNDS,
+    SEARCH_KEY_MAX_LENGTH,
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# Hashes below the current cost are flagged by verify_and_update and rehashed.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=PASSWORD_HASH_ROUNDS,
+    bcrypt__min_rounds=PASSWORD_HASH_ROUNDS,
+)
 
 
 def hash_password(password: str):
@@ -20,23 +37,149 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_response(status: str, message: str, data: Any = None) -> Dict:
-    return {"status": status, "message": message, "data": data}
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class EnvelopeResponse(JSONResponse):
+    """
+    JSON response rendered by pydantic-core in a single pass, models
+    included, instead of going through jsonable_encoder and json.dumps.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content, fallback=str)
+
+
+# Headers of the injected response that must not override the envelope's own.
+ENVELOPE_OWN_HEADERS = {b"content-length", b"content-type"}
+
+
+def create_response(
+    status: str,
+    message: str,
+    data: Any = None,
+    pagination: Optional[Dict] = None,
+    status_code: int = 200,
+    response: Optional[Response] = None,
+) -> EnvelopeResponse:
+    """
+    Build the response envelope. Headers set on the route's injected
+    response, such as cookies, are carried over.
+    """
+
+    content = {"status": status, "message": message, "data": data}
+    if pagination is not None:
+        content["pagination"] = pagination
+
+    envelope = EnvelopeResponse(content, status_code=status_code)
+    if response is not None:
+        envelope.raw_headers.extend(
+            header
+            for header in response.raw_headers
+            if header[0] not in ENVELOPE_OWN_HEADERS
+        )
+    return envelope
+
+
+def encode_cursor(id: PydanticObjectId) -> str:
+    """Encodes the last seen ID of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(ObjectId(id).binary).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[PydanticObjectId]:
+    """Decodes a cursor produced by `encode_cursor`."""
+    if not cursor:
+        return None
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        return PydanticObjectId(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def validate_page_limit(limit: int) -> int:
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Limit must be between 1 and {MAX_PAGE_LIMIT}",
+        )
+    return limit
+
+
+def paginate(
+    items: List[T], limit: int, get_id: Callable[[T], PydanticObjectId]
+) -> Tuple[List[T], Optional[str]]:
+    """Splits `limit + 1` fetched items into a page and the cursor of the next one."""
+    if len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    return page, encode_cursor(get_id(page[-1]))
+
+
+def create_pagination(next_cursor: Optional[str], limit: int) -> Dict:
+    return {"next_cursor": next_cursor, "limit": limit}
+
+
+def normalize_search_term(text: str) -> str:
+    """Case fold, strip accents and collapse whitespace for search matching."""
+
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def build_search_keys(*values: str) -> List[str]:
+    """Every prefix, up to the maximum key length, of the normalized values."""
+
+    keys = set()
+    for value in values:
+        term = normalize_search_term(value)[:SEARCH_KEY_MAX_LENGTH]
+        keys.update(term[:length] for length in range(1, len(term) + 1))
+    return sorted(keys)
+
+
+def rank_user_match(
+    query: str, email: str, first_name: str, last_name: str
+) -> Optional[int]:
+    """
+    Rank how well a normalized query matches a user, lower is better, or
+    None when it does not match at all.
+    """
+
+    email = normalize_search_term(email)
+    first_name = normalize_search_term(first_name)
+    last_name = normalize_search_term(last_name)
+
+    if email == query:
+        return 0
+    if email.startswith(query):
+        return 1
+    if f"{first_name} {last_name}".startswith(query):
+        return 2
+    if first_name.startswith(query) or last_name.startswith(query):
+        return 3
+    return None
 
 
 async def http_exception_handler(_: Request, exc: HTTPException):
-    return JSONResponse(
+    return EnvelopeResponse(
         status_code=exc.status_code,
         content={
             "status": RESPONSE_STATUS_ERROR,
             "message": exc.detail,
             "data": None,
         },
+        headers=exc.headers,
     )
 
 
 async def validation_exception_handler(_: Request, exc: RequestValidationError):
-    return JSONResponse(
+    return EnvelopeResponse(
         status_code=400,
         content={
             "status": RESPONSE_STATUS_ERROR,
@@ -0,0 +1,234 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import src.manager.study_room_manager as study_room_manager_module
+from src.manager.message_bus import InMemoryMessageBus, InMemoryMessageBusHub
+from src.manager.presence import presence_manager
+from src.manager.study_room_manager import StudyRoomManager
+from src.schemas.participant import Participant, Permission
+
+STUDY_ROOM_ID = str(ObjectId())
+OWNER_ID = str(ObjectId())
+EDITOR_ID = str(ObjectId())
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        pass
+
+    def of_type(self, frame_type: str):
+        return [frame for frame in self.frames if frame["type"] == frame_type]
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Stand-in for the study room and content collections."""
+
+    contents = {STUDY_ROOM_ID: "hello"}
+    study_room = SimpleNamespace(
+        id=ObjectId(STUDY_ROOM_ID),
+        is_active=True,
+        participants=[
+            Participant(
+                user_id=OWNER_ID,
+                is_owner=True,
+                is_active=True,
+                permission=Permission.can_edit,
+            ),
+            Participant(
+                user_id=EDITOR_ID, is_active=True, permission=Permission.can_edit
+            ),
+        ],
+    )
+
+    async def get(study_room_id):
+        return study_room if str(study_room_id) == STUDY_ROOM_ID else None
+
+    async def read(study_room_id):
+        return contents.get(str(study_room_id), "")
+
+    async def write(study_room_id, content, previous=None):
+        contents[str(study_room_id)] = content
+
+    monkeypatch.setattr(
+        study_room_manager_module, "StudyRoom", SimpleNamespace(get=get)
+    )
+    monkeypatch.setattr(
+        study_room_manager_module,
+        "StudyRoomContentRepository",
+        SimpleNamespace(read=read, write=write),
+    )
+    return contents
+
+
+async def drain():
+    """Let the connection writer tasks send what was queued."""
+
+    await asyncio.sleep(0.01)
+
+
+def run_on_two_nodes(scenario):
+    async def main():
+        hub = InMemoryMessageBusHub()
+        first = StudyRoomManager(InMemoryMessageBus(hub))
+        second = StudyRoomManager(InMemoryMessageBus(hub))
+        try:
+            await scenario(first, second)
+        finally:
+            await presence_manager.stop()
+
+    asyncio.run(main())
+
+
+def test_ops_from_another_node_are_applied_by_the_owner(storage):
+    async def scenario(first, second):
+        owner_socket, editor_socket, other_tab = (
+            FakeWebSocket(),
+            FakeWebSocket(),
+            FakeWebSocket(),
+        )
+        owner_connection = await first.connect(owner_socket, OWNER_ID)
+        editor_connection = await second.connect(editor_socket, EDITOR_ID)
+        await second.connect(other_tab, EDITOR_ID)
+
+        sync = {"type": "document_sync", "data": {"study_room_id": STUDY_ROOM_ID}}
+        await first.handle_frame(OWNER_ID, owner_connection, sync)
+        await second.handle_frame(
+            EDITOR_ID,
+            editor_connection,
+            {
+                "type": "document_ops",
+                "data": {
+                    "study_room_id": STUDY_ROOM_ID,
+                    "revision": 0,
+                    "ops": [5, " world"],
+                },
+            },
+        )
+        await drain()
+
+        assert STUDY_ROOM_ID in first.rooms
+        assert STUDY_ROOM_ID not in second.rooms
+        assert first.rooms[STUDY_ROOM_ID].document.content == "hello world"
+
+        # The acknowledgement only goes to the connection that sent the ops.
+        assert editor_socket.of_type("document_ack") == [
+            {
+                "type": "document_ack",
+                "data": {"study_room_id": STUDY_ROOM_ID, "revision": 1},
+            }
+        ]
+        assert other_tab.of_type("document_ack") == []
+        assert [
+            frame["data"]["ops"] for frame in other_tab.of_type("document_ops")
+        ] == [[5, " world"]]
+        assert [
+            frame["data"]["ops"] for frame in owner_socket.of_type("document_ops")
+        ] == [[5, " world"]]
+        assert editor_socket.of_type("document_ops") == []
+
+        await first.flush_all()
+        assert storage[STUDY_ROOM_ID] == "hello world"
+
+    run_on_two_nodes(scenario)
+
+
+def test_concurrent_ops_from_both_nodes_converge(storage):
+    async def scenario(first, second):
+        owner_socket, editor_socket = FakeWebSocket(), FakeWebSocket()
+        owner_connection = await first.connect(owner_socket, OWNER_ID)
+        editor_connection = await second.connect(editor_socket, EDITOR_ID)
+
+        def ops(revision, components):
+            return {
+                "type": "document_ops",
+                "data": {
+                    "study_room_id": STUDY_ROOM_ID,
+                    "revision": revision,
+                    "ops": components,
+                },
+            }
+
+        await first.handle_frame(OWNER_ID, owner_connection, ops(0, ["> ", 5]))
+        await second.handle_frame(EDITOR_ID, editor_connection, ops(0, [5, "!"]))
+        await drain()
+
+        assert first.rooms[STUDY_ROOM_ID].document.content == "> hello!"
+        assert [
+            frame["data"]["revision"] for frame in owner_socket.of_type("document_ack")
+        ] == [1]
+        assert [
+            frame["data"]["revision"] for frame in editor_socket.of_type("document_ack")
+        ] == [2]
+        # The editor's insert is shifted past the owner's prefix before it is sent.
+        assert [
+            frame["data"]["ops"] for frame in owner_socket.of_type("document_ops")
+        ] == [[7, "!"]]
+        assert [
+            frame["data"]["ops"] for frame in editor_socket.of_type("document_ops")
+        ] == [["> ", 5]]
+
+    run_on_two_nodes(scenario)
+
+
+def test_leaving_from_another_node_closes_the_room(storage):
+    async def scenario(first, second):
+        owner_socket, editor_socket = FakeWebSocket(), FakeWebSocket()
+        owner_connection = await first.connect(owner_socket, OWNER_ID)
+        editor_connection = await second.connect(editor_socket, EDITOR_ID)
+
+        sync = {"type": "document_sync", "data": {"study_room_id": STUDY_ROOM_ID}}
+        await first.handle_frame(OWNER_ID, owner_connection, sync)
+        await second.handle_frame(EDITOR_ID, editor_connection, sync)
+        assert set(first.rooms[STUDY_ROOM_ID].members) == {
+            owner_connection,
+            editor_connection,
+        }
+        assert second.connection_rooms[editor_connection] == {STUDY_ROOM_ID}
+
+        await second.disconnect(EDITOR_ID, editor_connection)
+        assert set(first.rooms[STUDY_ROOM_ID].members) == {owner_connection}
+        await first.disconnect(OWNER_ID, owner_connection)
+        assert STUDY_ROOM_ID not in first.rooms
+        assert first.bus.hub.leases == {}
+
+    run_on_two_nodes(scenario)
+
+
+def test_flush_drops_a_room_whose_lease_was_taken_over(storage):
+    async def scenario(first, second):
+        owner_socket = FakeWebSocket()
+        owner_connection = await first.connect(owner_socket, OWNER_ID)
+        await first.handle_frame(
+            OWNER_ID,
+            owner_connection,
+            {
+                "type": "document_ops",
+                "data": {
+                    "study_room_id": STUDY_ROOM_ID,
+                    "revision": 0,
+                    "ops": [5, "!"],
+                },
+            },
+        )
+
+        first.bus.hub.leases[STUDY_ROOM_ID] = second.bus.node_id
+        await first.flush_all()
+
+        assert STUDY_ROOM_ID not in first.rooms
+        assert storage[STUDY_ROOM_ID] == "hello"
+
+    run_on_two_nodes(scenario)